@@ -1,7 +1,6 @@
 
 from pathlib import Path
 import os
-from cryptography.fernet import Fernet
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -14,7 +13,80 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Encryption Key for Passwords
 ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', 'ztPF3wqDiNOxcmSQQa-C4-TGAXavFwjtPnUsTiLskZI=')
-cipher_suite = Fernet(ENCRYPTION_KEY)
+
+# Every key that may still have encrypted data, newest first. New values are
+# encrypted with the first one, the others are only used to decrypt until the
+# rotate_keys command has re-encrypted everything. To rotate, generate a key and
+# set ENCRYPTION_KEYS=<new key>,<old key>, then run rotate_keys.
+ENCRYPTION_KEYS = [key for key in os.getenv('ENCRYPTION_KEYS', '').split(',') if key] or [ENCRYPTION_KEY]
+ENCRYPTION_KEY = ENCRYPTION_KEYS[0]
+
+# Key for the HMAC blind index stored next to encrypted passwords, lets us find
+# duplicate or reused passwords with an indexed lookup instead of decrypting.
+# Changing it invalidates every stored index, rerun the backfill migration after.
+BLIND_INDEX_KEY = os.getenv('BLIND_INDEX_KEY', 'f3b1c7d2a94e6085bc1e2f7d8a6039c4e5b7a1d2c3f4e5a6b7c8d9e0f1a2b3c4')
+
+# Saved passwords are decrypted this many rows at a time (one page of the list),
+# optionally spread over a thread pool of VAULT_DECRYPT_WORKERS threads
+VAULT_DECRYPT_BATCH_SIZE = int(os.getenv('VAULT_DECRYPT_BATCH_SIZE', 100))
+VAULT_DECRYPT_WORKERS = int(os.getenv('VAULT_DECRYPT_WORKERS', 1))
+
+# How ObserverRegistry delivers events: 'sync' calls observers inline, 'async'
+# queues them for worker threads. EVENT_LIMITS caps the queued events per event
+# type, OVERFLOW decides what happens past a limit ('drop' or run inline: 'sync').
+OBSERVER_DISPATCH = {
+    'MODE': os.getenv('OBSERVER_DISPATCH_MODE', 'sync'),
+    'WORKERS': 2,
+    'QUEUE_SIZE': 1000,
+    'EVENT_LIMITS': {},
+    'OVERFLOW': 'drop',
+}
+
+# Per-user vault summary shown on the vault page lives in the cache, kept up to
+# date by signal handlers. Swap in FileBasedCache to share it between processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mypass',
+    }
+}
+VAULT_SUMMARY_TIMEOUT = 60 * 60
+
+# The vault health report decrypts every password, it is cached this many seconds
+VAULT_HEALTH_TIMEOUT = 5 * 60
+
+# Vault imports write this many rows per transaction, encrypting them on a pool
+# of VAULT_IMPORT_WORKERS threads
+VAULT_IMPORT_BATCH_SIZE = int(os.getenv('VAULT_IMPORT_BATCH_SIZE', 500))
+VAULT_IMPORT_WORKERS = int(os.getenv('VAULT_IMPORT_WORKERS', 4))
+# Uploads larger than this many bytes are imported by a background worker thread
+# instead of in the upload request, the user is notified when it finishes
+VAULT_IMPORT_INLINE_BYTES = int(os.getenv('VAULT_IMPORT_INLINE_BYTES', 1024 * 1024))
+
+# Vault exports are read and encrypted this many rows per frame, with a key derived
+# from the user's passphrase using this many PBKDF2 iterations
+VAULT_EXPORT_CHUNK_SIZE = int(os.getenv('VAULT_EXPORT_CHUNK_SIZE', 500))
+VAULT_EXPORT_KDF_ITERATIONS = 480000
+
+# Rows per page on the vault list views (keyset pagination on id)
+VAULT_PAGE_SIZE = int(os.getenv('VAULT_PAGE_SIZE', 25))
+
+# Read notifications older than this many days are removed by prune_notifications
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', 90))
+
+# Session storage, one of Django's session backends:
+#   cached_db       read from the cache, written through to the database (default)
+#   cache           cache only, sessions are lost with the cache (LocMemCache is per process)
+#   db              database only
+#   signed_cookies  no server-side storage, the session data is signed but readable
+#                   by the browser and a logout cannot revoke an earlier cookie
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'cached_db')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_BACKEND}'
+
+# The session's last_activity is only rewritten when it is older than this many
+# seconds, so most vault requests do not save the session at all. Keep it well
+# under the one-minute inactivity timeout, which it shortens by up to this much.
+SESSION_ACTIVITY_RESOLUTION = int(os.getenv('SESSION_ACTIVITY_RESOLUTION', 10))
 
 # Django's SECRET_KEY (this is required by Django for security)
 SECRET_KEY = os.getenv('DJANGO_SECRET_KEY', 'your_secure_django_secret_key')
@@ -43,11 +115,13 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'MyPassApplication.middleware.SessionManagerMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'MyPassApplication.middleware.UserLookupCounterMiddleware',
 ]
 
 ROOT_URLCONF = 'MyPass.urls'
@@ -81,6 +155,10 @@ DATABASES = {
     }
 }
 
+# PRAGMAs run on every new SQLite connection (name -> value), see
+# MyPassApplication/database.py. Empty here, settings_production turns on WAL.
+SQLITE_PRAGMAS = {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -0,0 +1,37 @@
+"""
+Production settings for MyPass.
+
+Run with DJANGO_SETTINGS_MODULE=MyPass.settings_production. Everything not set
+here comes from settings.py.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+import os
+
+DEBUG = False
+
+ALLOWED_HOSTS = [host for host in os.getenv('ALLOWED_HOSTS', 'localhost').split(',') if host]
+
+# Seconds a writer waits on a locked database before giving up
+DB_BUSY_TIMEOUT = int(os.getenv('DB_BUSY_TIMEOUT', 5))
+
+# Keep connections open between requests instead of reconnecting (and rerunning
+# the PRAGMAs below) on every request, checking them before reuse
+DATABASES['default'].update({
+    'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {'timeout': DB_BUSY_TIMEOUT},
+})
+
+# WAL lets readers keep reading while a write is in progress. With WAL,
+# synchronous=NORMAL only syncs at checkpoints, a power loss can lose the last
+# commits but never corrupts the file. mmap_size maps up to that many bytes of
+# the database for reads, cache_size is in KiB when negative.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': DB_BUSY_TIMEOUT * 1000,
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
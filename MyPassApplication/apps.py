@@ -1,5 +1,6 @@
 # apps.py
 from django.apps import AppConfig
+from django.conf import settings
 from .components import SavedPasswords, Dashboard
 from .mediators import UIMediator
 from .observer_registry import ObserverRegistry
@@ -12,6 +13,10 @@ class MypassapplicationConfig(AppConfig):
     name = 'MyPassApplication'
 
     def ready(self):
+        # Connect the signal receivers
+        from . import signals  # noqa: F401
+        # and the per-connection SQLite PRAGMAs
+        from . import database  # noqa: F401
 
         # Initialize mediator
         mediator = UIMediator()
@@ -29,5 +34,16 @@ class MypassapplicationConfig(AppConfig):
         ObserverRegistry.register_observer("password_deleted", saved_passwords)
         ObserverRegistry.register_observer("password_deleted", dashboard)
 
+        # Choose synchronous or queued observer dispatch
+        dispatch = getattr(settings, 'OBSERVER_DISPATCH', {})
+        if dispatch.get('MODE', 'sync') == 'async':
+            ObserverRegistry.configure(
+                mode='async',
+                workers=dispatch.get('WORKERS', 2),
+                queue_size=dispatch.get('QUEUE_SIZE', 1000),
+                event_limits=dispatch.get('EVENT_LIMITS'),
+                overflow=dispatch.get('OVERFLOW', 'drop'),
+            )
+
 
         
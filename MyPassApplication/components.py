@@ -1,22 +1,26 @@
+import logging
+
 from .observer_registry import Observer
 
+logger = logging.getLogger(__name__)
+
 class SavedPasswords(Observer):
     def __init__(self, mediator):
         self.mediator = mediator
 
     def update_password_list(self, data):
-        print(f"SavedPasswords: Updated with new data: {data}")
+        logger.debug("SavedPasswords: Updated with new data: %s", data)
         # Inform the mediator about changes
         self.mediator.notify("SavedPasswords", "password_updated", data)
 
     def remove_password(self, data):
-        print(f"SavedPasswords: Removed password data: {data}")
+        logger.debug("SavedPasswords: Removed password data: %s", data)
         # Inform the mediator about the removal
         #self.mediator.notify("SavedPasswords", "password_deleted", data)
 
     def add_password(self, data):
-        print(f"SavedPasswords: Added password data: {data}")
-        
+        logger.debug("SavedPasswords: Added password data: %s", data)
+
 
     def update(self, event, data):
         if event == "password_created":
@@ -26,7 +30,7 @@ class SavedPasswords(Observer):
         elif event == "password_updated":
             self.update_password_list(data)
         else:
-            print(f"SavedPasswords: Unhandled event: {event}")
+            logger.debug("SavedPasswords: Unhandled event: %s", event)
 
 
 
@@ -35,7 +39,7 @@ class Dashboard(Observer):
         self.mediator = mediator
 
     def refresh_dashboard(self, data):
-        print(f"Dashboard: Refreshed with data: {data}")
+        logger.debug("Dashboard: Refreshed with data: %s", data)
         # Inform the mediator about changes
         self.mediator.notify("Dashboard", "dashboard_updated", data)
 
@@ -43,4 +47,4 @@ class Dashboard(Observer):
         if event in ("password_created", "password_deleted", "password_updated"):
             self.refresh_dashboard(data)
         else:
-            print(f"Dashboard: Unhandled event: {event}")
+            logger.debug("Dashboard: Unhandled event: %s", event)
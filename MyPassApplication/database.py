@@ -0,0 +1,28 @@
+import logging
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    # Runs once per new connection, so with CONN_MAX_AGE set the cost is paid
+    # once per worker rather than once per request
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            # PRAGMA values cannot be bound as parameters, they come from settings only
+            cursor.execute(f"PRAGMA {name} = {value}")
+        if 'journal_mode' in pragmas:
+            cursor.execute("PRAGMA journal_mode")
+            mode = cursor.fetchone()[0]
+            # In-memory databases (the test database) stay in 'memory' mode
+            if mode.lower() != str(pragmas['journal_mode']).lower():
+                logger.info(f"SQLite journal_mode is {mode}, {pragmas['journal_mode']} was requested")
@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from django.conf import settings
+
+from .crypto import get_cipher
+
+logger = logging.getLogger(__name__)
+
+DECRYPTION_ERROR = "Error decrypting password"
+
+
+class VaultDecryptionService:
+    """Decrypt saved Account passwords (or raw vault tokens) in bounded batches.
+
+    Rows are pulled from the database with ``iterator(chunk_size=batch_size)`` so
+    only one batch is ever held in memory, and each batch can be spread over a
+    thread pool when ``max_workers`` is greater than one.
+    """
+
+    def __init__(self, cipher=None, batch_size=None, max_workers=None):
+        self.cipher = cipher or get_cipher()
+        self.batch_size = batch_size or getattr(settings, 'VAULT_DECRYPT_BATCH_SIZE', 100)
+        self.max_workers = max_workers or getattr(settings, 'VAULT_DECRYPT_WORKERS', 1)
+
+    def decrypt_account(self, account):
+        """Return the template entry for a single account."""
+        try:
+            decrypted_password = self.cipher.decrypt(account.password.encode()).decode()
+        except Exception as e:
+            logger.error(f"Error decrypting password for account {account.name}: {e}")
+            decrypted_password = DECRYPTION_ERROR
+        return {'account': account, 'decrypted_password': decrypted_password}
+
+    def decrypt_token(self, token):
+        if not token:
+            return token
+        try:
+            return self.cipher.decrypt(token.encode()).decode()
+        except Exception as e:
+            logger.error(f"Error decrypting vault value: {e}")
+            return DECRYPTION_ERROR
+
+    def decrypt_tokens(self, tokens):
+        """Decrypt a list of Fernet tokens (e.g. raw EncryptedTextField values) in one batch."""
+        if self.max_workers > 1 and len(tokens) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                return list(executor.map(self.decrypt_token, tokens))
+        return [self.decrypt_token(token) for token in tokens]
+
+    def decrypt_batch(self, accounts):
+        """Decrypt a list of accounts, using the thread pool when one is configured."""
+        if self.max_workers > 1 and len(accounts) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                return list(executor.map(self.decrypt_account, accounts))
+        return [self.decrypt_account(account) for account in accounts]
+
+    def iter_batches(self, queryset):
+        """Yield lists of decrypted entries, at most ``batch_size`` long."""
+        batch = []
+        for account in queryset.iterator(chunk_size=self.batch_size):
+            batch.append(account)
+            if len(batch) >= self.batch_size:
+                yield self.decrypt_batch(batch)
+                batch = []
+        if batch:
+            yield self.decrypt_batch(batch)
+
+    def iter_entries(self, queryset):
+        """Yield decrypted entries one by one without materializing the queryset."""
+        for batch in self.iter_batches(queryset):
+            yield from batch
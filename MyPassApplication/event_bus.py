@@ -0,0 +1,106 @@
+from collections import Counter
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class EventBus:
+    """Bounded in-process queue drained by worker threads.
+
+    ``dispatch(event, data)`` is called on a worker thread for every published
+    event. Each event type may only have ``event_limits.get(event, default_limit)``
+    events waiting or running at once; when that limit or the queue itself is
+    full the event is either dropped (``overflow='drop'``) or dispatched inline
+    in the publishing thread (``overflow='sync'``), which pushes back on the caller.
+    """
+
+    def __init__(self, dispatch, workers=2, queue_size=1000, default_limit=None,
+                 event_limits=None, overflow='drop'):
+        if overflow not in ('drop', 'sync'):
+            raise ValueError("overflow must be 'drop' or 'sync'")
+        self.dispatch = dispatch
+        self.workers = workers
+        self.default_limit = default_limit or queue_size
+        self.event_limits = dict(event_limits or {})
+        self.overflow = overflow
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._in_flight = Counter()
+        self._lock = threading.Lock()
+        self._threads = []
+        self.metrics = {name: Counter() for name in ('published', 'dispatched', 'dropped', 'overflowed', 'failed')}
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'EventBus-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        # Let the queued events finish, then stop the workers
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def drain(self):
+        """Block until every queued event has been dispatched."""
+        self._queue.join()
+
+    def publish(self, event, data):
+        """Queue an event, returns False if it was dropped."""
+        self._count('published', event)
+        limit = self.event_limits.get(event, self.default_limit)
+        with self._lock:
+            accepted = self._in_flight[event] < limit
+            if accepted:
+                self._in_flight[event] += 1
+        if accepted:
+            try:
+                self._queue.put_nowait((event, data))
+                return True
+            except queue.Full:
+                with self._lock:
+                    self._in_flight[event] -= 1
+
+        if self.overflow == 'sync':
+            self._count('overflowed', event)
+            self._dispatch(event, data)
+            return True
+        self._count('dropped', event)
+        logger.warning(f"EventBus: dropped '{event}' event, queue is full")
+        return False
+
+    def snapshot(self):
+        """Return the metrics as plain dicts, plus the current queue depth."""
+        with self._lock:
+            stats = {name: dict(counter) for name, counter in self.metrics.items()}
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def _count(self, name, event):
+        with self._lock:
+            self.metrics[name][event] += 1
+
+    def _dispatch(self, event, data):
+        try:
+            self.dispatch(event, data)
+            self._count('dispatched', event)
+        except Exception:
+            self._count('failed', event)
+            logger.exception(f"EventBus: observer failed while handling '{event}'")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                event, data = item
+                self._dispatch(event, data)
+                with self._lock:
+                    self._in_flight[event] -= 1
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,129 @@
+import logging
+
+from django import forms
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+from .crypto import get_cipher
+
+logger = logging.getLogger(__name__)
+
+DECRYPTION_ERROR = "Error decrypting value"
+
+
+class DecryptionFailed(ValueError):
+    """An undecryptable field value was about to be written to the database."""
+
+
+class UndecryptableValue(str):
+    """Read in place of a value no configured key can decrypt.
+
+    Renders as DECRYPTION_ERROR, but the field refuses to store it, so the
+    placeholder can never be encrypted over the real secret.
+    """
+
+    def __new__(cls):
+        return super().__new__(cls, DECRYPTION_ERROR)
+
+
+class Ciphertext:
+    """A Fernet token loaded from the database and not decrypted yet."""
+    __slots__ = ('token',)
+
+    def __init__(self, token):
+        self.token = token
+
+    def decrypt(self):
+        return get_cipher().decrypt(self.token.encode()).decode()
+
+    def __eq__(self, other):
+        return isinstance(other, Ciphertext) and other.token == self.token
+
+    def __hash__(self):
+        return hash(self.token)
+
+    def __repr__(self):
+        return '<Ciphertext>'
+
+
+class EncryptedAttribute(DeferredAttribute):
+    # Data descriptor, so every read goes through __get__ and the token is only
+    # decrypted the first time the attribute is actually used
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, Ciphertext):
+            try:
+                plaintext = value.decrypt()
+            except Exception as e:
+                # The token stays in place so saving the instance cannot overwrite it
+                logger.error(f"Error decrypting {self.field.model.__name__}.{self.field.name}: {e}")
+                return UndecryptableValue()
+            instance.__dict__[self.field.attname] = value = plaintext
+        return value
+
+    def __set__(self, instance, value):
+        # Assigning the placeholder back (model validation and form cleaning do)
+        # leaves the undecryptable token in place
+        if isinstance(value, UndecryptableValue) and isinstance(instance.__dict__.get(self.field.attname), Ciphertext):
+            return
+        instance.__dict__[self.field.attname] = value
+
+
+class EncryptedTextField(models.TextField):
+    """Text column stored as a Fernet token, encrypted on save and decrypted on first read.
+
+    ``max_length`` limits the plaintext in forms, the column itself is unbounded
+    since tokens are several times longer than the value they hold.
+    """
+    descriptor_class = EncryptedAttribute
+
+    def from_db_value(self, value, expression, connection):
+        return Ciphertext(value) if value else value
+
+    def to_python(self, value):
+        if isinstance(value, Ciphertext):
+            return value
+        return super().to_python(value)
+
+    def pre_save(self, model_instance, add):
+        # Read the stored value directly, an unchanged token is written back as is
+        return model_instance.__dict__.get(self.attname)
+
+    def get_prep_value(self, value):
+        if isinstance(value, Ciphertext):
+            return value.token
+        if isinstance(value, UndecryptableValue):
+            raise DecryptionFailed(f"{self.model.__name__}.{self.name} could not be decrypted and cannot be saved.")
+        value = super().get_prep_value(value)
+        if not value:
+            return value
+        return get_cipher().encrypt(value.encode()).decode()
+
+    def save_form_data(self, instance, data):
+        # An edit form shows an undecryptable value as DECRYPTION_ERROR, when that
+        # text comes back unchanged the stored token is kept
+        if data == DECRYPTION_ERROR and isinstance(getattr(instance, self.attname), UndecryptableValue):
+            return
+        super().save_form_data(instance, data)
+
+    def formfield(self, **kwargs):
+        if self.max_length is not None and not self.choices:
+            return models.Field.formfield(self, **{'form_class': forms.CharField, 'max_length': self.max_length, **kwargs})
+        return super().formfield(**kwargs)
+
+
+def encrypt_fields(instance, cipher=None):
+    """Encrypt the plaintext EncryptedTextField values of an unsaved instance in place.
+
+    Lets callers do the encryption up front (e.g. on a thread pool) before a
+    ``bulk_create``, which then writes the tokens unchanged.
+    """
+    cipher = cipher or get_cipher()
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, EncryptedTextField):
+            value = instance.__dict__.get(field.attname)
+            if value and not isinstance(value, Ciphertext):
+                instance.__dict__[field.attname] = Ciphertext(cipher.encrypt(value.encode()).decode())
+    return instance
@@ -120,3 +120,30 @@ class AccountForm(forms.ModelForm):
     class Meta:
         model = Account
         fields = ['name', 'password']
+
+
+class VaultImportForm(forms.Form):
+    FORMAT_CHOICES = [('', 'Guess from the file name'), ('csv', 'CSV'), ('json', 'JSON'), ('jsonl', 'JSON Lines')]
+    TYPE_CHOICES = [
+        ('', "Use the file's 'type' column"),
+        ('login', 'Logins'),
+        ('credit_card', 'Credit Cards'),
+        ('identity', 'Identities'),
+        ('secure_note', 'Secure Notes'),
+        ('account', 'Saved Passwords'),
+    ]
+
+    file = forms.FileField(label='File to import')
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, required=False)
+    default_type = forms.ChoiceField(choices=TYPE_CHOICES, required=False, label='Items in the file')
+
+
+class VaultExportForm(forms.Form):
+    FORMAT_CHOICES = [('jsonl', 'JSON Lines'), ('csv', 'CSV')]
+
+    passphrase = forms.CharField(widget=forms.PasswordInput, min_length=8,
+                                 help_text='Needed to decrypt or import the export later.')
+    format = forms.ChoiceField(choices=FORMAT_CHOICES)
+    gzip = forms.BooleanField(required=False, label='Compress')
+    cursor = forms.RegexField(regex=r'^[a-z_]+:\d+$', required=False,
+                              help_text="Resume after a 'type:id' cursor.")
@@ -0,0 +1,43 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from MyPassApplication.vault_audit import audit_vault
+
+class Command(BaseCommand):
+    help = 'Reports password strength, reuse and similarity for every saved password in a vault'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to audit, all users when omitted.')
+        parser.add_argument('--show-entries', action='store_true',
+                            help='List every weak, reused or name-like password entry.')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        for user in users.iterator():
+            started = time.monotonic()
+            report = audit_vault(user.id)
+            elapsed = time.monotonic() - started
+
+            self.stdout.write(
+                f"{user.username}: {report['total']} passwords, {report['weak_count']} weak, "
+                f"{report['reused_count']} reused in {len(report['reuse_clusters'])} clusters, "
+                f"{report['similar_count']} similar to the site or username, "
+                f"average entropy {report['average_entropy']} bits ({elapsed:.2f}s)"
+            )
+            if options['show_entries']:
+                for entry in report['entries']:
+                    if entry['strength'] in ('very weak', 'weak') or entry['reused'] or entry['similar_to_name']:
+                        self.stdout.write(
+                            f"  [{entry['kind']}] {entry['label']}: {entry['strength']}, "
+                            f"{entry['entropy']} bits, length {entry['length']}"
+                            f"{', reused' if entry['reused'] else ''}"
+                            f"{', similar to name' if entry['similar_to_name'] else ''}"
+                        )
+
+        self.stdout.write(self.style.SUCCESS('Vault audit completed.'))
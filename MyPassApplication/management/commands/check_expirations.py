@@ -0,0 +1,144 @@
+from heapq import merge
+from itertools import groupby
+from operator import itemgetter
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.utils import timezone
+from MyPassApplication.models import Checkpoint, CreditCard, Identity
+from datetime import date, timedelta
+from django.core.mail import get_connection, send_mass_mail
+
+CHECKPOINT_NAME = 'check_expirations'
+
+# How each kind of item records the expiration date it was last emailed about
+NOTICE_FIELDS = {
+    'creditcard': (CreditCard, 'expiration_date', 'expiration_notice_date'),
+    'passport': (Identity, 'passport_expiration_date', 'passport_notice_date'),
+    'license': (Identity, 'license_expiration_date', 'license_notice_date'),
+}
+
+class Command(BaseCommand):
+    help = 'Checks for upcoming expirations and sends each user one digest email'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows fetched per query chunk and digests sent per batch.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Build the digests and report throughput without sending any email.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        today = timezone.now().date()
+        upcoming_date = today + timedelta(days=30)  # Notify if expiration is within 30 days
+
+        # Only look at the date range since the previous run, items already emailed
+        # about their current expiration date are skipped in SQL
+        checkpoint, _ = Checkpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+        window_start = today
+        if checkpoint.value.get('last_run'):
+            window_start = min(date.fromisoformat(checkpoint.value['last_run']), today)
+
+        started = time.monotonic()
+        # Each source is ordered by user, merging them keeps every user's items
+        # together so digests can be built while streaming, one user at a time
+        items = merge(
+            self.expiring_creditcards(window_start, upcoming_date, batch_size),
+            self.expiring_passports(window_start, upcoming_date, batch_size),
+            self.expiring_licenses(window_start, upcoming_date, batch_size),
+            key=itemgetter(0),
+        )
+
+        connection = None if dry_run else get_connection(fail_silently=False)
+        if connection is not None:
+            connection.open()
+
+        item_count = digest_count = 0
+        pending = []
+        pending_items = []
+        try:
+            for user_id, user_items in groupby(items, key=itemgetter(0)):
+                user_items = list(user_items)
+                item_count += len(user_items)
+                user = user_items[0][1]
+                if not user.email:
+                    continue
+                pending.append(self.build_digest(user, [line for _, _, line, _ in user_items]))
+                pending_items.extend(key for _, _, _, key in user_items)
+                digest_count += 1
+                if len(pending) >= batch_size:
+                    self.send(pending, pending_items, connection)
+                    pending, pending_items = [], []
+            self.send(pending, pending_items, connection)
+        finally:
+            if connection is not None:
+                connection.close()
+
+        if not dry_run:
+            checkpoint.value = {'last_run': today.isoformat(), 'notified_items': item_count}
+            checkpoint.save()
+
+        elapsed = time.monotonic() - started
+        rate = item_count / elapsed if elapsed else 0
+        summary = (f'{item_count} expiring items for {digest_count} users '
+                   f'in {elapsed:.2f}s ({rate:.0f} items/sec)')
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'Dry run: {summary}, no emails sent.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Expiration checks completed, {summary}.'))
+
+    def pending_notices(self, kind, window_start, upcoming_date):
+        # Items whose expiration date falls in the window and that were not yet
+        # emailed about that exact date (a changed date is notified again)
+        model, date_field, notice_field = NOTICE_FIELDS[kind]
+        return model.objects.filter(
+            **{f'{date_field}__gte': window_start, f'{date_field}__lte': upcoming_date}
+        ).filter(
+            Q(**{f'{notice_field}__isnull': True}) | ~Q(**{notice_field: F(date_field)})
+        ).select_related('user').order_by('user_id', 'id')
+
+    def expiring_creditcards(self, window_start, upcoming_date, batch_size):
+        cards = self.pending_notices('creditcard', window_start, upcoming_date)
+        for card in cards.iterator(chunk_size=batch_size):
+            yield (card.user_id, card.user,
+                   f'Your credit card ending in {card.card_number[-4:]} is expiring on {card.expiration_date}.',
+                   ('creditcard', card.id))
+
+    def expiring_passports(self, window_start, upcoming_date, batch_size):
+        identities = self.pending_notices('passport', window_start, upcoming_date)
+        for identity in identities.iterator(chunk_size=batch_size):
+            yield (identity.user_id, identity.user,
+                   f'Your passport for {identity.full_name} is expiring on {identity.passport_expiration_date}.',
+                   ('passport', identity.id))
+
+    def expiring_licenses(self, window_start, upcoming_date, batch_size):
+        identities = self.pending_notices('license', window_start, upcoming_date)
+        for identity in identities.iterator(chunk_size=batch_size):
+            yield (identity.user_id, identity.user,
+                   f'Your driver\'s license for {identity.full_name} is expiring on {identity.license_expiration_date}. '
+                   f'Please renew it to keep your records up to date.',
+                   ('license', identity.id))
+
+    def build_digest(self, user, lines):
+        body = '\n'.join(f'- {line}' for line in lines)
+        return (
+            'Expiration Notice',
+            f'Dear {user.username},\n\nThe following items in your vault are expiring soon:\n\n{body}\n\nBest regards,\nMyPass Team',
+            settings.DEFAULT_FROM_EMAIL,
+            [user.email],
+        )
+
+    def send(self, datatuple, items, connection):
+        # All batches go through the same, already open, connection. Items are
+        # only recorded as notified once their digest has actually been sent.
+        if not datatuple or connection is None:
+            return
+        send_mass_mail(datatuple, fail_silently=False, connection=connection)
+        for kind in NOTICE_FIELDS:
+            ids = [item_id for item_kind, item_id in items if item_kind == kind]
+            if ids:
+                model, date_field, notice_field = NOTICE_FIELDS[kind]
+                model.objects.filter(id__in=ids).update(**{notice_field: F(date_field)})
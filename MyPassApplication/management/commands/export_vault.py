@@ -0,0 +1,71 @@
+import base64
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from MyPassApplication.vault_export import EXPORT_FORMATS, VaultExporter, parse_cursor, resume_point
+
+class Command(BaseCommand):
+    help = "Writes an encrypted, streaming export of a user's vault"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to write the export to.')
+        parser.add_argument('--user', required=True, help='Username whose vault is exported.')
+        parser.add_argument('--passphrase', default=os.getenv('MYPASS_EXPORT_PASSPHRASE'),
+                            help='Passphrase the export is encrypted with (default: $MYPASS_EXPORT_PASSPHRASE).')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='jsonl', help='Record format.')
+        parser.add_argument('--gzip', action='store_true', help='Compress every frame before encrypting it.')
+        parser.add_argument('--chunk-size', type=int, help='Rows read per query chunk and written per frame.')
+        parser.add_argument('--cursor', help="Only export rows after this 'type:id' cursor.")
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue an interrupted export already written to the path.')
+
+    def handle(self, *args, **options):
+        if not options['passphrase']:
+            raise CommandError('A passphrase is required (--passphrase or $MYPASS_EXPORT_PASSPHRASE).')
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+        try:
+            parse_cursor(options['cursor'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        settings = {'fmt': options['format'], 'compress': options['gzip']}
+        cursor, mode, include_header, include_columns = options['cursor'], 'wb', True, True
+        if options['resume'] and os.path.exists(options['path']):
+            # Keep the existing header and key, drop a partially written last frame
+            # and continue after the last row that made it to disk, writing the
+            # CSV column names again if the export stopped before they were complete
+            with open(options['path'], 'rb') as stream:
+                try:
+                    header, cursor, offset, has_columns = resume_point(stream, options['passphrase'])
+                except Exception as e:
+                    raise CommandError(f"Cannot resume {options['path']}: {e}")
+            with open(options['path'], 'r+b') as stream:
+                stream.truncate(offset)
+            settings = {
+                'fmt': header['format'],
+                'compress': header['gzip'],
+                'salt': base64.b64decode(header['salt']),
+                'iterations': header['iterations'],
+            }
+            mode, include_header, include_columns = 'ab', False, not has_columns
+            self.stdout.write(f"Resuming after {cursor or 'the header'}")
+
+        exporter = VaultExporter(user.id, options['passphrase'], chunk_size=options['chunk_size'], **settings)
+        started = time.monotonic()
+        written = frames = 0
+        with open(options['path'], mode) as stream:
+            for frame in exporter.stream(cursor=cursor, include_header=include_header,
+                                         include_columns=include_columns):
+                stream.write(frame)
+                written += len(frame)
+                frames += 1
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {frames} frames ({written} bytes) for {user.username} in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,59 @@
+from cryptography.fernet import InvalidToken
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from MyPassApplication.vault_export import open_export
+from MyPassApplication.vault_import import IMPORT_FORMATS, IMPORT_TYPES, VaultImporter, detect_format, parse_records
+
+class Command(BaseCommand):
+    help = 'Imports vault items for a user from a CSV, JSON or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import.')
+        parser.add_argument('--user', required=True, help='Username that will own the imported items.')
+        parser.add_argument('--format', choices=IMPORT_FORMATS,
+                            help='File format, guessed from the file extension when omitted.')
+        parser.add_argument('--type', choices=sorted(IMPORT_TYPES),
+                            help="Record type for rows without a 'type' column, e.g. login for browser exports.")
+        parser.add_argument('--passphrase',
+                            help='Read an encrypted export written by export_vault with this passphrase.')
+        parser.add_argument('--batch-size', type=int, help='Rows written per transaction.')
+        parser.add_argument('--workers', type=int, help='Threads used to encrypt rows.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        fmt = options['format'] or detect_format(options['path'])
+        importer = VaultImporter(
+            user,
+            batch_size=options['batch_size'],
+            max_workers=options['workers'],
+            default_type=options['type'],
+        )
+
+        def progress(result, elapsed):
+            self.stdout.write(f"  {result.rows} rows read, {result.created_total} imported "
+                              f"({result.rows / elapsed if elapsed else 0:.0f} rows/s)")
+
+        try:
+            if options['passphrase']:
+                with open(options['path'], 'rb') as stream:
+                    fmt, lines = open_export(stream, options['passphrase'])
+                    result = importer.run(parse_records(lines, fmt), progress=progress)
+            else:
+                with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                    result = importer.run(parse_records(stream, fmt), progress=progress)
+        except OSError as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+        except InvalidToken:
+            raise CommandError('The export could not be decrypted, check the passphrase.')
+
+        for number, message in result.errors:
+            self.stderr.write(f"  row {number}: {message}")
+        created = ', '.join(f"{count} {name}" for name, count in sorted(result.created.items())) or 'nothing'
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {created} from {result.rows} rows in {result.batches} batches, "
+            f"{len(result.errors)} errors, {result.elapsed:.2f}s ({result.rows_per_second:.0f} rows/s)."
+        ))
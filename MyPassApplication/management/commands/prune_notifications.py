@@ -0,0 +1,38 @@
+from datetime import timedelta
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from MyPassApplication.models import Notification
+
+class Command(BaseCommand):
+    help = 'Deletes read notifications older than NOTIFICATION_RETENTION_DAYS, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Keep read notifications newer than this many days (default: NOTIFICATION_RETENTION_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows deleted per statement, keeps each write transaction short.')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.NOTIFICATION_RETENTION_DAYS
+        batch_size = options['batch_size']
+        if days < 0 or batch_size < 1:
+            raise CommandError('--days cannot be negative and --batch-size must be positive.')
+        cutoff = timezone.now() - timedelta(days=days)
+
+        # Uses the (is_read, timestamp) index, unread notifications are never pruned
+        expired = Notification.objects.filter(is_read=True, timestamp__lt=cutoff).order_by('id')
+        started = time.monotonic()
+        deleted = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += Notification.objects.filter(id__in=ids).delete()[0]
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Pruned {deleted} read notifications older than {days} days in {elapsed:.2f}s.'
+        ))
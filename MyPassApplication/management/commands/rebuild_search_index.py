@@ -0,0 +1,30 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from MyPassApplication.search import rebuild_index, search_enabled
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text vault search index from the vault tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild the entries of this username.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows read and indexed per batch.')
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            raise CommandError('The search index needs SQLite with FTS5, run migrate first.')
+        user_id = None
+        if options['user']:
+            try:
+                user_id = User.objects.get(username=options['user']).id
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        started = time.monotonic()
+        # Searches see either the old or the complete new index
+        with transaction.atomic():
+            count = rebuild_index(user_id, chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} vault items in {elapsed:.2f}s.'))
@@ -0,0 +1,134 @@
+import time
+
+from cryptography.fernet import Fernet, InvalidToken
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from MyPassApplication.crypto import get_cipher, get_encryption_keys, key_fingerprint
+from MyPassApplication.fields import Ciphertext, EncryptedTextField
+from MyPassApplication.models import Account, Checkpoint, CreditCard, Identity, Login, SecureNote
+
+CHECKPOINT_NAME = 'rotate_keys'
+
+# Account.password holds a Fernet token in a plain CharField, the other models use EncryptedTextField
+ROTATED_MODELS = [Account, Login, CreditCard, Identity, SecureNote]
+MANUALLY_ENCRYPTED_FIELDS = {Account: ['password']}
+
+
+def encrypted_fields(model):
+    fields = [field.name for field in model._meta.concrete_fields if isinstance(field, EncryptedTextField)]
+    return MANUALLY_ENCRYPTED_FIELDS.get(model, []) + fields
+
+class Command(BaseCommand):
+    help = 'Re-encrypts every stored secret with the newest key in ENCRYPTION_KEYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Rows read and updated per transaction.')
+        parser.add_argument('--rate', type=float, default=0,
+                            help='Maximum rows per second, 0 for no limit. Keeps the load low on a live site.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the saved progress and start from the first row.')
+
+    def handle(self, *args, **options):
+        keys = get_encryption_keys()
+        if len(keys) < 2:
+            self.stdout.write('Only one encryption key is configured, rows are re-encrypted with it anyway.')
+        self.cipher = get_cipher()
+        self.primary = Fernet(keys[0])
+        chunk_size, rate = options['chunk_size'], options['rate']
+        if chunk_size < 1 or rate < 0:
+            raise CommandError('--chunk-size must be positive and --rate cannot be negative.')
+
+        # Progress is kept per key, so a run for a newer key starts over
+        fingerprint = key_fingerprint(keys[0])
+        checkpoint, _ = Checkpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+        if options['restart'] or checkpoint.value.get('key') != fingerprint:
+            checkpoint.value = {'key': fingerprint, 'positions': {}}
+        positions = checkpoint.value['positions']
+
+        total = sum(
+            model.objects.filter(id__gt=positions.get(model._meta.label, 0)).count()
+            for model in ROTATED_MODELS
+        )
+        self.stdout.write(f'{total} rows to check for key {fingerprint}.')
+
+        started = time.monotonic()
+        processed = rotated = 0
+        for model in ROTATED_MODELS:
+            fields = encrypted_fields(model)
+            last_id = positions.get(model._meta.label, 0)
+            while True:
+                last_id, checked, changed = self.rotate_chunk(model, fields, last_id, chunk_size)
+                if not checked:
+                    break
+                processed += checked
+                rotated += changed
+                positions[model._meta.label] = last_id
+                checkpoint.save()
+
+                elapsed = time.monotonic() - started
+                if rate:
+                    # Sleep off any lead over the target rate
+                    ahead = processed / rate - elapsed
+                    if ahead > 0:
+                        time.sleep(ahead)
+                        elapsed += ahead
+                speed = processed / elapsed if elapsed else 0
+                eta = (total - processed) / speed if speed else 0
+                self.stdout.write(
+                    f'  {model.__name__}: {processed}/{total} rows ({processed / max(total, 1):.0%}), '
+                    f'{speed:.0f} rows/s, about {eta:.0f}s left'
+                )
+
+        checkpoint.value['completed'] = True
+        checkpoint.save()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Key rotation completed: {rotated} of {processed} rows re-encrypted in {elapsed:.2f}s.'
+        ))
+
+    def rotate_chunk(self, model, fields, last_id, chunk_size):
+        # The rows are read and written in one short transaction with the rows
+        # locked (where the database supports it), so an edit made while the
+        # command runs is never overwritten with an older value
+        with transaction.atomic():
+            rows = list(
+                model.objects.select_for_update()
+                .filter(id__gt=last_id).order_by('id')
+                .values_list('id', *fields)[:chunk_size]
+            )
+            if not rows:
+                return last_id, 0, 0
+
+            changed = 0
+            by_field = {field: [] for field in fields}
+            for row in rows:
+                instance = None
+                for field, value in zip(fields, row[1:]):
+                    token = value.token if isinstance(value, Ciphertext) else value
+                    if not token or self.is_current(token):
+                        continue
+                    try:
+                        new_token = self.cipher.rotate(token.encode()).decode()
+                    except InvalidToken:
+                        self.stderr.write(f'  {model.__name__} {row[0]}: {field} cannot be decrypted with any key, skipped')
+                        continue
+                    instance = instance or model(id=row[0])
+                    # A plain text Value, an EncryptedTextField would encrypt the token again
+                    setattr(instance, field, models.Value(new_token, output_field=models.TextField()))
+                    by_field[field].append(instance)
+                changed += instance is not None
+
+            # bulk_update writes one CASE WHEN id=... THEN <token> per field, taking
+            # the Value expressions as they are
+            for field, instances in by_field.items():
+                if instances:
+                    model.objects.bulk_update(instances, [field])
+        return rows[-1][0], len(rows), changed
+
+    def is_current(self, token):
+        try:
+            self.primary.decrypt(token.encode())
+            return True
+        except InvalidToken:
+            return False
@@ -1,97 +1,71 @@
+from collections import defaultdict
+import logging
+import threading
+
 from .observer_registry import Observer
 
+logger = logging.getLogger(__name__)
+
+
 class UIMediator:
-   
+    # Which component method handles each event. register() compiles this into
+    # the handler table, so notify() is a single dict lookup.
+    EVENT_ROUTES = {
+        "password_created": [("SavedPasswords", "add_password"), ("Dashboard", "refresh_dashboard")],
+        "password_deleted": [("SavedPasswords", "remove_password"), ("Dashboard", "refresh_dashboard")],
+        "password_updated": [("SavedPasswords", "update_password_list"), ("Dashboard", "refresh_dashboard")],
+        "identity_created": [("Dashboard", "refresh_dashboard")],
+        "identity_deleted": [("Dashboard", "refresh_dashboard")],
+        "identity_updated": [("Dashboard", "refresh_dashboard")],
+        "identity_expired": [("Dashboard", "refresh_dashboard")],
+        "credit_card_created": [("Dashboard", "refresh_dashboard")],
+        "credit_card_deleted": [("Dashboard", "refresh_dashboard")],
+        "credit_card_updated": [("Dashboard", "refresh_dashboard")],
+        "secure_note_created": [("Dashboard", "refresh_dashboard")],
+        "secure_note_deleted": [("Dashboard", "refresh_dashboard")],
+        "secure_note_updated": [("Dashboard", "refresh_dashboard")],
+        "vault_imported": [("Dashboard", "refresh_dashboard")],
+    }
 
     def __init__(self):
         self.components = {}
+        self._handlers = defaultdict(list)
+        self._local = threading.local()
 
     def register(self, name, component):
-       
         self.components[name] = component
+        for event, routes in self.EVENT_ROUTES.items():
+            for component_name, method_name in routes:
+                if component_name == name:
+                    self.subscribe(event, getattr(component, method_name))
 
-    def notify(self, sender, event, data=None):
-        
-        if sender in self.components:
-            print(f"Mediator: Received event '{event}' from '{sender}' with data {data}")
-        
-        # Event handling for various entities
-        if event in ("password_created", "password_deleted", "password_updated"):
-            self._handle_password_event(event, data)
-
-        elif event in ("identity_created", "identity_deleted", "identity_updated"):
-            self._handle_identity_event(event, data)
+    def subscribe(self, event, handler):
+        # Adds a handler(data) callable for an event
+        self._handlers[event].append(handler)
 
-        elif event in ("credit_card_created", "credit_card_deleted", "credit_card_updated"):
-            self._handle_credit_card_event(event, data)
-
-        elif event in ("secure_note_created", "secure_note_deleted", "secure_note_updated"):
-            self._handle_secure_note_event(event, data)
-        elif event == "identity_expired":
-            self._handle_identity_expired_event(data)
-        
-        else:
-            print(f"Unhandled event: {event}")
-
-    def _handle_password_event(self, event, data):
-       
-        if event == "password_created":
-            if "SavedPasswords" in self.components:
-                self.components["SavedPasswords"].add_password(data)
-            if "Dashboard" in self.components:
-                self.components["Dashboard"].refresh_dashboard(data)
-        elif event == "password_deleted":
-            if "SavedPasswords" in self.components:
-                self.components["SavedPasswords"].remove_password(data)
-            if "Dashboard" in self.components:
-                self.components["Dashboard"].refresh_dashboard(data)
-        elif event == "password_updated":
-            if "SavedPasswords" in self.components :
-                self.components["SavedPasswords"].update_password(data)
-            if "Dashboard" in self.components:
-                self.components["Dashboard"].refresh_dashboard(data)
-
-    def _handle_identity_event(self, event, data):
-       
-        if event == "identity_created":
-            if "Dashboard" in self.components:
-                self.components["Dashboard"].refresh_dashboard(data)
-        elif event == "identity_deleted":
-            if "Dashboard" in self.components:
-                self.components["Dashboard"].refresh_dashboard(data)
-        elif event == "identity_updated":
-            if "Dashboard" in self.components:
-                self.components["Dashboard"].refresh_dashboard(data)
-
-    def _handle_credit_card_event(self, event, data):
-       
-        if event == "credit_card_created":
-            if "Dashboard" in self.components:
-                self.components["Dashboard"].refresh_dashboard(data)
-        elif event == "credit_card_deleted":
-            if "Dashboard" in self.components:
-                self.components["Dashboard"].refresh_dashboard(data)
-        elif event == "credit_card_updated":
-            if "Dashboard" in self.components:
-                self.components["Dashboard"].refresh_dashboard(data)
+    def notify(self, sender, event, data=None):
+        logger.debug("Mediator: Received event '%s' from '%s' with data %s", event, sender, data)
 
-    def _handle_secure_note_event(self, event, data):
-        """
-        Handle events related to secure notes.
-        """
-        if event == "secure_note_created":
-            if "Dashboard" in self.components:
-                self.components["Dashboard"].refresh_dashboard(data)
-        elif event == "secure_note_deleted":
-            if "Dashboard" in self.components:
-                self.components["Dashboard"].refresh_dashboard(data)
-        elif event == "secure_note_updated":
-            if "Dashboard" in self.components:
-                self.components["Dashboard"].refresh_dashboard(data)
+        handlers = self._handlers.get(event)
+        if not handlers:
+            logger.debug("Mediator: Unhandled event: %s", event)
+            return
 
+        # A handler that notifies the same event again (directly or through another
+        # component) would loop forever, the nested notification is skipped instead
+        active = self._active_events()
+        if event in active:
+            logger.debug("Mediator: Skipping re-entrant event: %s", event)
+            return
+        active.add(event)
+        try:
+            for handler in handlers:
+                handler(data)
+        finally:
+            active.discard(event)
 
-    def _handle_identity_expired_event(self, data):
-     if "Dashboard" in self.components:
-         self.components["Dashboard"].refresh_dashboard(data)
-     else:
-         print("Error: 'Dashboard' component not registered.")
+    def _active_events(self):
+        active = getattr(self._local, 'events', None)
+        if active is None:
+            active = self._local.events = set()
+        return active
@@ -0,0 +1,34 @@
+import logging
+
+from django.conf import settings
+
+from .models import SessionManager
+
+logger = logging.getLogger(__name__)
+
+
+class SessionManagerMiddleware:
+    # Attaches a fresh SessionManager to every request as request.session_manager.
+    # Must come after SessionMiddleware.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.session_manager = SessionManager(request)
+        return self.get_response(request)
+
+
+class UserLookupCounterMiddleware:
+    # Debug aid: reports how many times SessionManager had to query the database
+    # for the current user while handling a request (should be at most one).
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if settings.DEBUG:
+            session_manager = getattr(request, 'session_manager', None)
+            lookups = session_manager.user_lookup_count if session_manager else 0
+            response['X-User-Lookups'] = str(lookups)
+            logger.debug(f"{request.method} {request.path}: {lookups} user lookup(s)")
+        return response
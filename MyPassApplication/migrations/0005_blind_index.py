@@ -0,0 +1,86 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:51
+
+import hashlib
+import hmac
+import logging
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from django.conf import settings
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+
+def blind_index(value):
+    # Same digest as crypto.blind_index, kept here so the migration does not
+    # depend on application code
+    if value is None:
+        return ''
+    return hmac.new(settings.BLIND_INDEX_KEY.encode(), value.encode(), hashlib.sha256).hexdigest()
+
+
+def get_cipher():
+    # Decrypts with any configured key, like crypto.get_cipher
+    keys = getattr(settings, 'ENCRYPTION_KEYS', None) or [settings.ENCRYPTION_KEY]
+    return MultiFernet([Fernet(key) for key in keys])
+
+
+def backfill_password_index(apps, schema_editor):
+    Account = apps.get_model('MyPassApplication', 'Account')
+    Login = apps.get_model('MyPassApplication', 'Login')
+    cipher = get_cipher()
+
+    batch, skipped = [], 0
+    for account in Account.objects.only('id', 'password').iterator(chunk_size=500):
+        try:
+            plaintext = cipher.decrypt(account.password.encode()).decode()
+        except InvalidToken:
+            skipped += 1
+            continue
+        account.password_index = blind_index(plaintext)
+        batch.append(account)
+        if len(batch) >= 500:
+            Account.objects.bulk_update(batch, ['password_index'])
+            batch = []
+    Account.objects.bulk_update(batch, ['password_index'])
+    if skipped:
+        logger.warning(f"{skipped} saved passwords could not be decrypted with any key, their password index is left empty")
+
+    batch = []
+    for login in Login.objects.only('id', 'password').iterator(chunk_size=500):
+        login.password_index = blind_index(login.password)
+        batch.append(login)
+        if len(batch) >= 500:
+            Login.objects.bulk_update(batch, ['password_index'])
+            batch = []
+    Login.objects.bulk_update(batch, ['password_index'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MyPassApplication', '0004_alter_identity_license_expiration_date_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='password_index',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='login',
+            name='password_index',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['user', 'password_index'], name='MyPassAppli_user_id_463656_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='login',
+            index=models.Index(fields=['user', 'password_index'], name='MyPassAppli_user_id_d4cd45_idx'),
+        ),
+        migrations.RunPython(backfill_password_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MyPassApplication', '0005_blind_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['user', 'id'], name='MyPassAppli_user_id_962502_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditcard',
+            index=models.Index(fields=['user', 'id'], name='MyPassAppli_user_id_0618a9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='identity',
+            index=models.Index(fields=['user', 'id'], name='MyPassAppli_user_id_d3037f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='login',
+            index=models.Index(fields=['user', 'id'], name='MyPassAppli_user_id_f6046e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='securenote',
+            index=models.Index(fields=['user', 'id'], name='MyPassAppli_user_id_505ae9_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MyPassApplication', '0006_user_id_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', 'timestamp'], name='MyPassAppli_user_id_64ac49_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MyPassApplication', '0007_notification_unread_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Checkpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='creditcard',
+            name='expiration_notice_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='identity',
+            name='license_notice_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='identity',
+            name='passport_notice_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='creditcard',
+            name='expiration_date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='identity',
+            name='license_expiration_date',
+            field=models.DateField(blank=True, db_index=True, default=None, null=True),
+        ),
+        migrations.AlterField(
+            model_name='identity',
+            name='passport_expiration_date',
+            field=models.DateField(blank=True, db_index=True, default=None, null=True),
+        ),
+    ]
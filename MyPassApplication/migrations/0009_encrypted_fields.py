@@ -0,0 +1,78 @@
+# Generated by Django 5.0.14 on 2026-10-18 12:07
+
+from cryptography.fernet import Fernet, MultiFernet
+from django.conf import settings
+from django.db import migrations, models
+
+import MyPassApplication.fields
+
+# Model -> columns that become encrypted
+ENCRYPTED_FIELDS = {
+    'Login': ['password'],
+    'CreditCard': ['card_number', 'cvv'],
+    'Identity': ['passport_number', 'social_security_number'],
+    'SecureNote': ['content'],
+}
+
+
+def convert(apps, transform):
+    # Runs while the columns are plain TextFields, so values are read and written raw
+    for model_name, fields in ENCRYPTED_FIELDS.items():
+        model = apps.get_model('MyPassApplication', model_name)
+        batch = []
+        for item in model.objects.only('id', *fields).iterator(chunk_size=500):
+            for field in fields:
+                value = getattr(item, field)
+                if value:
+                    setattr(item, field, transform(value))
+            batch.append(item)
+            if len(batch) >= 500:
+                model.objects.bulk_update(batch, fields)
+                batch = []
+        model.objects.bulk_update(batch, fields)
+
+
+def get_cipher():
+    # Built from the settings here rather than crypto.get_cipher, so the migration
+    # does not depend on application code: encrypts with the first key, decrypts with any
+    keys = getattr(settings, 'ENCRYPTION_KEYS', None) or [settings.ENCRYPTION_KEY]
+    return MultiFernet([Fernet(key) for key in keys])
+
+
+def encrypt_values(apps, schema_editor):
+    cipher = get_cipher()
+    convert(apps, lambda value: cipher.encrypt(value.encode()).decode())
+
+
+def decrypt_values(apps, schema_editor):
+    cipher = get_cipher()
+    convert(apps, lambda value: cipher.decrypt(value.encode()).decode())
+
+
+def alter_fields(field_class):
+    return [
+        migrations.AlterField(model_name='creditcard', name='card_number', field=field_class(max_length=16)),
+        migrations.AlterField(model_name='creditcard', name='cvv', field=field_class(max_length=4)),
+        migrations.AlterField(model_name='identity', name='passport_number', field=field_class(blank=True, max_length=20)),
+        migrations.AlterField(model_name='identity', name='social_security_number', field=field_class(blank=True, max_length=11)),
+        migrations.AlterField(model_name='login', name='password', field=field_class(max_length=255)),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MyPassApplication', '0008_expiration_notices'),
+    ]
+
+    # Widen the columns to plain text, encrypt the existing rows, then switch to
+    # the encrypted field (which would otherwise try to decrypt the plaintext)
+    operations = alter_fields(models.TextField) + [
+        migrations.RunPython(encrypt_values, decrypt_values),
+    ] + alter_fields(MyPassApplication.fields.EncryptedTextField) + [
+        migrations.AlterField(
+            model_name='securenote',
+            name='content',
+            field=MyPassApplication.fields.EncryptedTextField(),
+        ),
+    ]
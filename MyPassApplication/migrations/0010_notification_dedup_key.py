@@ -0,0 +1,53 @@
+# Generated by Django 5.0.14 on 2026-10-18 12:13
+
+import hashlib
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def fill_dedup_keys(apps, schema_editor):
+    # Key every existing notification, a page of ids at a time so no cursor is
+    # held open over the table being updated
+    Notification = apps.get_model('MyPassApplication', 'Notification')
+    last_id = 0
+    while True:
+        batch = list(Notification.objects.filter(id__gt=last_id).order_by('id').only('id', 'message')[:500])
+        if not batch:
+            break
+        for notification in batch:
+            notification.dedup_key = hashlib.sha256(notification.message.encode()).hexdigest()
+        Notification.objects.bulk_update(batch, ['dedup_key'])
+        last_id = batch[-1].id
+
+    # Then keep only the oldest of each (user, key) in one statement, so the
+    # unique constraint can be added
+    first_ids = Notification.objects.values('user_id', 'dedup_key').annotate(first_id=Min('id')).values('first_id')
+    Notification.objects.exclude(id__in=first_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MyPassApplication', '0009_encrypted_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='dedup_key',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_dedup_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['is_read', 'timestamp'], name='MyPassAppli_is_read_4d25f5_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('user', 'dedup_key'), name='unique_notification_per_user'),
+        ),
+    ]
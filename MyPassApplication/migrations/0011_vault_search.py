@@ -0,0 +1,66 @@
+from django.db import migrations
+
+# A copy of the table and documents defined in search.py as of this migration,
+# so later changes there do not change what this migration creates
+SEARCH_TABLE = 'vault_search'
+
+CREATE_SEARCH_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "title, detail, owner, kind UNINDEXED, item_id UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+# kind -> (model, title field, detail fields), the order sets the rowid offsets
+SEARCH_SOURCES = {
+    'login': ('Login', 'site_name', ['site_url', 'username']),
+    'secure_note': ('SecureNote', 'title', []),
+    'identity': ('Identity', 'full_name', []),
+    'account': ('Account', 'name', []),
+}
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only, other databases use the search fallback
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    kinds = list(SEARCH_SOURCES)
+    insert = (
+        f"INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, title, detail, owner, kind, item_id) "
+        "VALUES (%s, %s, %s, %s, %s, %s)"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_SEARCH_TABLE)
+        for kind, (model_name, title_field, detail_fields) in SEARCH_SOURCES.items():
+            model = apps.get_model('MyPassApplication', model_name)
+            rows = model.objects.values_list('id', 'user_id', title_field, *detail_fields)
+            batch = []
+            for item_id, user_id, title, *details in rows.iterator(chunk_size=1000):
+                detail = ' '.join(value for value in details if value)
+                rowid = item_id * len(kinds) + kinds.index(kind)
+                batch.append((rowid, title or '', detail, f'u{user_id}', kind, item_id))
+                if len(batch) >= 1000:
+                    cursor.executemany(insert, batch)
+                    batch = []
+            cursor.executemany(insert, batch)
+    connection._vault_search_enabled = None
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+    connection._vault_search_enabled = None
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MyPassApplication', '0010_notification_dedup_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
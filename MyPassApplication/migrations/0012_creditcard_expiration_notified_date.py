@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-18 12:29
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_notified_cards(apps, schema_editor):
+    # Cards already inside the 30 day window were notified on every save so far
+    CreditCard = apps.get_model('MyPassApplication', 'CreditCard')
+    window_end = timezone.now().date() + timedelta(days=30)
+    CreditCard.objects.filter(expiration_date__lte=window_end).update(expiration_notified_date=models.F('expiration_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MyPassApplication', '0011_vault_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='creditcard',
+            name='expiration_notified_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(mark_notified_cards, migrations.RunPython.noop),
+    ]
@@ -1,51 +1,90 @@
-from django.db import models
+import hashlib
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth.models import User
 from .observer_registry import ObserverRegistry
+from .crypto import blind_index
+from .fields import Ciphertext, EncryptedTextField
 
 
 class SessionManager:
-    _instance = None
+    # One SessionManager per request (see SessionManagerMiddleware), nothing is
+    # shared between requests so it is safe under threaded and ASGI workers.
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(SessionManager, cls).__new__(cls)
-            cls._instance.initialized = False
-            cls._instance.current_user = None
-        return cls._instance
+    def __init__(self, request=None):
+        self.request = request
+        self.user_lookup_count = 0
+        self._user_cache = None
+
+    @classmethod
+    def for_request(cls, request):
+        # Returns the manager attached to this request, creating it if needed
+        session_manager = getattr(request, 'session_manager', None)
+        if session_manager is None:
+            session_manager = cls(request)
+            request.session_manager = session_manager
+        return session_manager
 
     def set_request(self, request):
         self.request = request
+        self.clear_user_cache()
 
     def login(self, user):
         self.request.session['is_authenticated'] = True
         self.request.session['user_id'] = user.id
+        self._user_cache = (user.id, user)
 
     def logout(self):
         self.request.session.flush()
+        self.clear_user_cache()
 
     def is_authenticated(self):
         return self.request.session.get('is_authenticated', False)
 
     def get_current_user(self):
+        # The resolved user is memoized for the request, keyed by the session's
+        # user id so a flushed or switched session never returns a stale user
         user_id = self.request.session.get('user_id')
-        if user_id:
-            try:
-                return User.objects.get(id=user_id)
-            except User.DoesNotExist:
-                self.request.session.flush()
-                return None
-        return None
+        if not user_id:
+            return None
+        if self._user_cache is not None and self._user_cache[0] == user_id:
+            return self._user_cache[1]
+
+        self.user_lookup_count += 1
+        try:
+            user = User.objects.get(id=user_id)
+        except User.DoesNotExist:
+            self.request.session.flush()
+            self.clear_user_cache()
+            return None
+        self._user_cache = (user_id, user)
+        return user
+
+    def clear_user_cache(self):
+        self._user_cache = None
+
+    def last_activity(self):
+        last_activity = self.request.session.get('last_activity')
+        return timezone.datetime.fromisoformat(last_activity) if last_activity else None
 
     def update_last_activity(self):
-        self.request.session['last_activity'] = timezone.now().isoformat()
+        # Assigning to the session marks it modified and saves it at the end of
+        # the request, so the timestamp is only moved once it is more than
+        # SESSION_ACTIVITY_RESOLUTION seconds old
+        now = timezone.now()
+        last_activity = self.last_activity()
+        resolution = timedelta(seconds=getattr(settings, 'SESSION_ACTIVITY_RESOLUTION', 0))
+        if last_activity and timedelta(0) <= now - last_activity < resolution:
+            return
+        self.request.session['last_activity'] = now.isoformat()
 
     def has_timed_out(self):
-        last_activity = self.request.session.get('last_activity')
+        last_activity = self.last_activity()
         if last_activity:
-            last_activity_time = timezone.datetime.fromisoformat(last_activity)
-            return timezone.now() - last_activity_time > timedelta(minutes=1)
+            return timezone.now() - last_activity > timedelta(minutes=1)
         return False
 
 
@@ -69,19 +108,28 @@ class Account(models.Model):
     name = models.CharField(max_length=100)
     password = models.CharField(max_length=100)  # Store encripted  password here
     suggested = models.BooleanField(default=False)  # New field to mark suggested passwords
+    password_index = models.CharField(max_length=64, blank=True, editable=False)  # HMAC blind index of the plaintext password
     #created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'password_index']),
+            models.Index(fields=['user', 'id']),
+        ]
+
     def __str__(self):
         return f"{self.name} : {self.password}"
     
     def save(self, *args, **kwargs):
-        created = self._state.adding  
+        created = self._state.adding
         super().save(*args, **kwargs)
         if created:
-            # Notify observers about the password creation
-            ObserverRegistry.notify_observers(
+            # Notify observers about the password creation, this is the only place
+            # the event is emitted and it waits for the row to be committed
+            ObserverRegistry.notify_on_commit(
                 event="password_created",
-                data={"id": self.id, "name": self.name}
+                data={"id": self.id, "name": self.name},
+                key=self.id,
             )
 
 
@@ -90,87 +138,140 @@ class Login(models.Model):
     site_name = models.CharField(max_length=255)
     site_url = models.URLField(blank=True)
     username = models.CharField(max_length=255)
-    password = models.CharField(max_length=255)
+    password = EncryptedTextField(max_length=255)
+    password_index = models.CharField(max_length=64, blank=True, editable=False)  # HMAC blind index of the password
     notes = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'password_index']),
+            models.Index(fields=['user', 'id']),
+        ]
+
     def __str__(self):
         return f"{self.site_name} ({self.username})"
 
+    def save(self, *args, **kwargs):
+        # A password still holding its loaded ciphertext has not changed, its index
+        # is current and it is never decrypted just to be saved again
+        if not isinstance(self.__dict__.get('password'), Ciphertext):
+            self.password_index = blind_index(self.password)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'password' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'password_index'}
+        super().save(*args, **kwargs)
+
+
+def expiry_upcoming(expiration_date):
+    # Expiration dates within the next 30 days (or already past) are notified
+    return expiration_date is not None and expiration_date <= timezone.now().date() + timedelta(days=30)
+
+
+class ExpiryEventsMixin:
+    # Shared by CreditCard and Identity. expiry_checks() returns one
+    # (flag, event, data) tuple or None per expiring document; a check marks its
+    # flag on the instance the first time, so a save is a single INSERT or UPDATE
+    # and the events are only emitted once it is committed. expiry_events is also
+    # read by the post_save notification receiver.
+
+    def prepare_expiry_events(self):
+        self.expiry_events = [event for event in self.expiry_checks() if event]
+        return self.expiry_events
+
+    def emit_expiry_events(self):
+        for _, event, data in self.expiry_events:
+            ObserverRegistry.notify_on_commit(event=event, data=data, key=self.pk)
+
+    def save(self, *args, **kwargs):
+        self.prepare_expiry_events()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.expiry_events:
+            kwargs['update_fields'] = set(update_fields) | {flag for flag, _, _ in self.expiry_events}
+        super().save(*args, **kwargs)
+        self.emit_expiry_events()
+
 
-class CreditCard(models.Model):
+class CreditCard(ExpiryEventsMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     cardholder_name = models.CharField(max_length=255)
-    card_number = models.CharField(max_length=16)
-    expiration_date = models.DateField()
-    cvv = models.CharField(max_length=4)
+    card_number = EncryptedTextField(max_length=16)
+    expiration_date = models.DateField(db_index=True)
+    cvv = EncryptedTextField(max_length=4)
     billing_address = models.TextField(blank=True)
+    expiration_notice_date = models.DateField(null=True, blank=True, editable=False)  # expiration date the last email was sent for
+    expiration_notified_date = models.DateField(null=True, blank=True, editable=False)  # expiration date the in-app notice was sent for
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+        ]
 
     def __str__(self):
         return f"Card ending in {self.card_number[-4:]}"
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.check_expiration()
+    def expiry_checks(self):
+        return [self.check_expiration()]
 
     def check_expiration(self):
-        upcoming_date = timezone.now().date() + timedelta(days=30)
-        if self.expiration_date and self.expiration_date <= upcoming_date:
-            # Notify observers about the credit card expiration
-            ObserverRegistry.notify_observers(
-                event="credit_card_expiring",
-                data={"user_id": self.user.id, "card_number": self.card_number[-4:]}
-            )
+        """Flag a card expiring within 30 days, returns (flag, event, data) once per expiration date."""
+        if expiry_upcoming(self.expiration_date) and self.expiration_notified_date != self.expiration_date:
+            self.expiration_notified_date = self.expiration_date
+            return ('expiration_notified_date', "credit_card_expiring",
+                    {"user_id": self.user_id, "card_number": self.card_number[-4:]})
+        return None
 
 
-class Identity(models.Model):
+class Identity(ExpiryEventsMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     full_name = models.CharField(max_length=255)
     date_of_birth = models.DateField(null=True, blank=True)
-    passport_number = models.CharField(max_length=20, blank=True)
-    passport_expiration_date = models.DateField(null=True, blank=True, default=None)
+    passport_number = EncryptedTextField(max_length=20, blank=True)
+    passport_expiration_date = models.DateField(null=True, blank=True, default=None, db_index=True)
     license_number = models.CharField(max_length=20, blank=True)
-    license_expiration_date = models.DateField(null=True, blank=True, default=None)
-    social_security_number = models.CharField(max_length=11, blank=True)
+    license_expiration_date = models.DateField(null=True, blank=True, default=None, db_index=True)
+    social_security_number = EncryptedTextField(max_length=11, blank=True)
     passport_notified = models.BooleanField(default=False)
     license_notified = models.BooleanField(default=False)
+    passport_notice_date = models.DateField(null=True, blank=True, editable=False)  # expiration dates the last emails were sent for
+    license_notice_date = models.DateField(null=True, blank=True, editable=False)
     notes = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+        ]
+
     def __str__(self):
         return self.full_name
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.check_passport_expiration()
-        self.check_license_expiration()
+    def expiry_checks(self):
+        return [self.check_passport_expiration(), self.check_license_expiration()]
 
     def check_passport_expiration(self):
-        upcoming_date = timezone.now().date() + timedelta(days=30)
-        if self.passport_expiration_date and self.passport_expiration_date <= upcoming_date:
-            if not self.passport_notified:
-                # Notify observers about the passport expiration
-                ObserverRegistry.notify_observers(
-                    event="passport_expiring",
-                    data={"user_id": self.user.id, "expiration_date": self.passport_expiration_date}
-                )
-                self.passport_notified = True
-                self.save(update_fields=['passport_notified'])
+        """Flag a passport expiring within 30 days, returns (flag, event, data) the first time."""
+        if expiry_upcoming(self.passport_expiration_date) and not self.passport_notified:
+            self.passport_notified = True
+            return ('passport_notified', "passport_expiring",
+                    {"user_id": self.user_id, "expiration_date": self.passport_expiration_date})
+        return None
 
     def check_license_expiration(self):
-        upcoming_date = timezone.now().date() + timedelta(days=30)
-        if self.license_expiration_date and self.license_expiration_date <= upcoming_date:
-            if not self.license_notified:
-                # Notify observers about the license expiration
-                ObserverRegistry.notify_observers(
-                    event="license_expiring",
-                    data={"user_id": self.user.id, "expiration_date": self.license_expiration_date}
-                )
-                self.license_notified = True
-                self.save(update_fields=['license_notified'])
+        """Flag a license expiring within 30 days, returns (flag, event, data) the first time."""
+        if expiry_upcoming(self.license_expiration_date) and not self.license_notified:
+            self.license_notified = True
+            return ('license_notified', "license_expiring",
+                    {"user_id": self.user_id, "expiration_date": self.license_expiration_date})
+        return None
 
 class SecureNote(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
-    content = models.TextField()
+    content = EncryptedTextField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+        ]
 
     def __str__(self):
         return self.title
@@ -181,6 +282,55 @@ class Notification(models.Model):
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
+    dedup_key = models.CharField(max_length=64, editable=False)  # sha256 of the message, unique per user
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_read', 'timestamp']),
+            models.Index(fields=['is_read', 'timestamp']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'dedup_key'], name='unique_notification_per_user'),
+        ]
 
     def __str__(self):
         return f"Notification for {self.user.username}: {self.message}"
+
+    @staticmethod
+    def make_dedup_key(message):
+        return hashlib.sha256(message.encode()).hexdigest()
+
+    def save(self, *args, **kwargs):
+        if not self.dedup_key:
+            self.dedup_key = self.make_dedup_key(self.message)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def create_once(cls, user_id, message):
+        # Insert-or-ignore on the (user, dedup_key) constraint, returns the new
+        # notification or None when the user already has this message. The
+        # savepoint keeps a duplicate from breaking the caller's transaction.
+        try:
+            with transaction.atomic():
+                return cls.objects.create(user_id=user_id, message=message)
+        except IntegrityError:
+            return None
+
+    @classmethod
+    def mark_read(cls, user, ids=None):
+        # Marks the user's unread notifications (or only the given ids) as read
+        # with a single UPDATE, returns the number of rows changed
+        unread = cls.objects.filter(user=user, is_read=False)
+        if ids is not None:
+            unread = unread.filter(id__in=ids)
+        return unread.update(is_read=True)
+
+
+class Checkpoint(models.Model):
+    # Progress marker for long running or periodic management commands
+    name = models.CharField(max_length=100, unique=True)
+    value = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
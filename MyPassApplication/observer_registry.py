@@ -1,12 +1,35 @@
+import weakref
 
-class Observer:    
-    #Base class for all observers in the Observer pattern.Observers must implement the `update` method.    
+from django.db import transaction
+
+from .event_bus import EventBus
+
+
+class _PendingEvent:
+    # on_commit callback for one event, listed under its key in the connection's
+    # pending events until it runs
+    def __init__(self, registry, event, data, key, pending):
+        self.registry = registry
+        self.event = event
+        self.data = data
+        self.key = key
+        self.pending = pending
+
+    def __call__(self):
+        if self.pending.get(self.key) is self:
+            del self.pending[self.key]
+        self.registry.notify_observers(event=self.event, data=self.data)
+
+
+class Observer:
+    #Base class for all observers in the Observer pattern.Observers must implement the `update` method.
     def update(self, event, data):
         raise NotImplementedError("Subclasses must implement the `update` method")
 
 
 class ObserverRegistry:
     _observers = {}
+    _bus = None  # set when dispatch mode is 'async', None means synchronous dispatch
 
     @classmethod
     def register_observer(cls, event, observer):
@@ -15,9 +38,51 @@ class ObserverRegistry:
             cls._observers[event] = []
         cls._observers[event].append(observer)
 
+    @classmethod
+    def configure(cls, mode='sync', **options):
+        # 'sync' calls observers in the caller's thread (the default, and what tests use),
+        # 'async' hands events to an EventBus drained by worker threads
+        if cls._bus is not None:
+            cls._bus.stop()
+            cls._bus = None
+        if mode == 'async':
+            cls._bus = EventBus(cls.dispatch, **options)
+            cls._bus.start()
+        elif mode != 'sync':
+            raise ValueError(f"Unknown observer dispatch mode: {mode}")
+
+    @classmethod
+    def metrics(cls):
+        # Published / dispatched / dropped / overflowed counts per event type (async mode only)
+        return cls._bus.snapshot() if cls._bus is not None else None
+
     @classmethod
     def notify_observers(cls, event, data):
-        #        Notify all observers of a specific event.      
+        #        Notify all observers of a specific event.
+        if cls._bus is not None:
+            cls._bus.publish(event, data)
+        else:
+            cls.dispatch(event, data)
+
+    @classmethod
+    def notify_on_commit(cls, event, data, key=None, using=None):
+        # Notify observers once the current transaction commits (right away in
+        # autocommit mode). An event with the same key already waiting for the
+        # same commit is merged into it. Rolled back events are never emitted.
+        key = (event, key)
+        connection = transaction.get_connection(using)
+        # Weak references: a callback dropped by a rollback (of the transaction
+        # or of a savepoint) is freed and its key disappears with it, so an
+        # event is never merged into one that will not run
+        pending = connection.__dict__.setdefault('_pending_events', weakref.WeakValueDictionary())
+        if key in pending:
+            return
+        pending[key] = callback = _PendingEvent(cls, event, data, key, pending)
+        transaction.on_commit(callback, using=using)
+
+    @classmethod
+    def dispatch(cls, event, data):
+        # Calls every observer registered for the event
         if event in cls._observers:
             for observer in cls._observers[event]:
-                observer.update(event, data)
\ No newline at end of file
+                observer.update(event, data)
@@ -0,0 +1,85 @@
+from django.conf import settings
+
+
+class KeysetPage:
+    """One page of a keyset (id cursor) paginated queryset, newest rows first.
+
+    Unlike offset pagination the database seeks straight to the cursor through
+    the (user, id) index, so every page costs the same no matter how deep it is.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _parse_cursor(value):
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def get_page_size():
+    return getattr(settings, 'VAULT_PAGE_SIZE', 25)
+
+
+def keyset_paginate(queryset, after=None, before=None, page_size=None):
+    """Return a KeysetPage of ``queryset`` ordered by descending id.
+
+    ``after`` returns the rows older than that id (the next page), ``before``
+    the rows newer than that id (the previous page). One extra row is fetched
+    to find out whether there is a page beyond this one.
+    """
+    page_size = page_size or get_page_size()
+    after, before = _parse_cursor(after), _parse_cursor(before)
+
+    if before is not None:
+        rows = list(queryset.filter(id__gt=before).order_by('id')[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        next_cursor = rows[-1].id if rows else None
+        previous_cursor = rows[0].id if rows and has_more else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    if after is not None:
+        queryset = queryset.filter(id__lt=after)
+    rows = list(queryset.order_by('-id')[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = rows[-1].id if rows and has_more else None
+    previous_cursor = rows[0].id if rows and after is not None else None
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+class KeysetPaginationMixin:
+    # Plugs keyset pagination into ListView, page_obj in the template context is
+    # a KeysetPage with next_cursor / previous_cursor for the navigation links.
+
+    def get_paginate_by(self, queryset):
+        return get_page_size()
+
+    def paginate_queryset(self, queryset, page_size):
+        page = keyset_paginate(
+            queryset,
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+            page_size=page_size,
+        )
+        return (None, page, page.object_list, page.has_other_pages())
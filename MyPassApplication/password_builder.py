@@ -1,11 +1,64 @@
 from abc import ABC, abstractmethod
-import random
+from dataclasses import dataclass
+from functools import lru_cache
+import secrets
 import string
 from .models import Password
 
+# Character classes a generated password can be required to contain
+CHARACTER_CLASSES = (
+    string.ascii_uppercase,
+    string.ascii_lowercase,
+    string.digits,
+    string.punctuation,
+)
+
+# Named classes used by password policies
+CLASS_CHARACTERS = {
+    'uppercase': string.ascii_uppercase,
+    'lowercase': string.ascii_lowercase,
+    'digits': string.digits,
+    'symbols': string.punctuation,
+}
+
+# Characters that are easy to misread, left out by policies with exclude_ambiguous
+AMBIGUOUS_CHARACTERS = "Il1|O0o`'\""
+
+
+@lru_cache(maxsize=None)
+def _sampling_table(pool):
+    """Translate table for rejection sampling random bytes into ``pool``.
+
+    Byte values below the largest multiple of ``len(pool)`` map to
+    ``pool[byte % len(pool)]``, the rest are deleted. Every pool character is
+    therefore equally likely, without any modulo bias.
+    """
+    if not pool or len(pool) > 256 or not pool.isascii():
+        raise ValueError("Character pool must hold 1 to 256 ASCII characters.")
+    limit = 256 - (256 % len(pool))
+    table = bytes(ord(pool[byte % len(pool)]) if byte < limit else 0 for byte in range(256))
+    return table, bytes(range(limit, 256)), limit
+
+
+def random_characters(pool, count):
+    """Return ``count`` uniformly random characters from ``pool`` using the OS CSPRNG."""
+    table, rejected, limit = _sampling_table(pool)
+    chunks = []
+    collected = 0
+    while collected < count:
+        # Ask for enough bytes to cover the expected rejections in one go
+        needed = count - collected
+        accepted = secrets.token_bytes(needed * 256 // limit + 16).translate(table, rejected)
+        chunks.append(accepted)
+        collected += len(accepted)
+    return b''.join(chunks)[:count].decode('ascii')
+
+
 class PasswordBuilder:
+    default_length = 8
+
     def __init__(self):
-        self._length = 8
+        self._length = None
         self._use_uppercase = False
         self._use_lowercase = False
         self._use_numbers = False
@@ -36,47 +89,195 @@ class PasswordBuilder:
         self._use_special_chars = True
         return self
 
-    @abstractmethod
     def build_character_pool(self):
-        """Define character pool based on password requirements."""
-        pass
+        """Define character pool based on the include_* flags."""
+        flags = (
+            (self._use_uppercase, string.ascii_uppercase),
+            (self._use_lowercase, string.ascii_lowercase),
+            (self._use_numbers, string.digits),
+            (self._use_special_chars, string.punctuation),
+        )
+        self.character_pool = ''.join(chars for enabled, chars in flags if enabled)
+
+    def get_length(self):
+        """Length chosen with set_length, or the builder's default."""
+        return self._length or self.default_length
 
     def build(self):
         """Generate the password using the character pool."""
+        return self.build_many(1)[0]
+
+    def build_many(self, count, require_all_classes=True):
+        """Generate ``count`` passwords at once.
+
+        Characters come from large ``secrets`` byte buffers. With
+        ``require_all_classes`` every password contains at least one character of
+        each class present in the pool, candidates missing one are rejected so the
+        result stays uniform over the valid passwords.
+        """
         self.build_character_pool()
         if not self.character_pool:
             raise ValueError("Character pool is empty; check builder configuration.")
 
-        # Generate the password by selecting random characters from the pool
-        password_value = ''.join(random.choice(self.character_pool) for _ in range(self._length))
-        return password_value
+        length = self.get_length()
+        pool = self.character_pool
+        required = []
+        if require_all_classes:
+            required = [frozenset(chars) for chars in CHARACTER_CLASSES if set(chars) & set(pool)]
+        if len(required) > length:
+            raise ValueError("Password length is too short to include every character class.")
+
+        passwords = []
+        while len(passwords) < count:
+            characters = random_characters(pool, (count - len(passwords)) * length)
+            for start in range(0, len(characters), length):
+                candidate = characters[start:start + length]
+                if all(not chars.isdisjoint(candidate) for chars in required):
+                    passwords.append(candidate)
+        return passwords
 
 
 class SimplePasswordBuilder(PasswordBuilder):
+    default_length = 8
+
     def build_character_pool(self):
-        """Set character pool for a simple password (e.g., lowercase only)."""
-        self.character_pool = string.ascii_lowercase
-        self.set_length(8)
+        """Set character pool for a simple password (lowercase only unless flags were set)."""
+        super().build_character_pool()
+        if not self.character_pool:
+            self.character_pool = string.ascii_lowercase
 
 
 
 class ComplexPasswordBuilder(PasswordBuilder):
+    default_length = 12
+
     def build_character_pool(self):
-        """Set character pool for a complex password (uppercase, lowercase, digits, special characters)."""
-        self.character_pool = (
-            string.ascii_uppercase +
-            string.ascii_lowercase +
-            string.digits +
-            string.punctuation
-        )
-        self.set_length(12)
+        """Set character pool for a complex password (uppercase, lowercase, digits, special characters unless flags were set)."""
+        super().build_character_pool()
+        if not self.character_pool:
+            self.character_pool = (
+                string.ascii_uppercase +
+                string.ascii_lowercase +
+                string.digits +
+                string.punctuation
+            )
+
+
 
+@dataclass(frozen=True)
+class PasswordPolicy:
+    """Declarative description of the passwords to generate.
+
+    ``classes`` names the character classes in the pool (keys of
+    CLASS_CHARACTERS), ``min_counts`` holds ``(class, count)`` pairs of
+    characters that must appear. Policies are immutable so their compiled form
+    can be cached and shared between requests.
+    """
+    min_length: int = 12
+    max_length: int = 12
+    classes: tuple = ('uppercase', 'lowercase', 'digits', 'symbols')
+    min_counts: tuple = ()
+    exclude_ambiguous: bool = False
+
+    def compile(self):
+        return compile_policy(self)
+
+
+class CompiledPasswordPolicy:
+    """A PasswordPolicy resolved into character pools and sampling tables.
+
+    Generating a password places the required minimum characters, fills the rest
+    from the full pool and shuffles, so the cost is O(length) for any policy.
+    """
+
+    def __init__(self, policy):
+        if policy.min_length < 1 or policy.max_length < policy.min_length:
+            raise ValueError("Password policy length range is invalid.")
+        excluded = set(AMBIGUOUS_CHARACTERS) if policy.exclude_ambiguous else set()
+        self.policy = policy
+        self.class_pools = {}
+        for name in policy.classes:
+            if name not in CLASS_CHARACTERS:
+                raise ValueError(f"Unknown character class: {name}")
+            self.class_pools[name] = ''.join(char for char in CLASS_CHARACTERS[name] if char not in excluded)
+        self.pool = ''.join(self.class_pools.values())
+
+        self.minimums = []
+        for name, count in policy.min_counts:
+            if name not in self.class_pools:
+                raise ValueError(f"Minimum given for a class the policy does not use: {name}")
+            self.minimums.append((self.class_pools[name], count))
+        if sum(count for _, count in self.minimums) > policy.max_length:
+            raise ValueError("Password policy minimums do not fit in the maximum length.")
+
+        # Build the sampling tables now so generation never does
+        for pool in [self.pool] + [pool for pool, _ in self.minimums]:
+            _sampling_table(pool)
+
+    def length_for(self, length=None):
+        """Clamp a requested length to the policy range, default to the minimum."""
+        required = sum(count for _, count in self.minimums)
+        length = length or self.policy.min_length
+        return max(self.policy.min_length, required, min(length, self.policy.max_length))
+
+    def generate(self, length=None):
+        length = self.length_for(length)
+        characters = []
+        for pool, count in self.minimums:
+            characters.extend(random_characters(pool, count))
+        characters.extend(random_characters(self.pool, length - len(characters)))
+        _system_random.shuffle(characters)
+        return ''.join(characters)
+
+    def generate_many(self, count, length=None):
+        return [self.generate(length) for _ in range(count)]
+
+
+_system_random = secrets.SystemRandom()
+
+
+@lru_cache(maxsize=None)
+def compile_policy(policy):
+    return CompiledPasswordPolicy(policy)
+
+
+ALL_CLASSES = ('uppercase', 'lowercase', 'digits', 'symbols')
+
+# Policies selectable by name in the create_password view
+PASSWORD_POLICIES = {
+    'simple': PasswordPolicy(min_length=8, max_length=8, classes=('lowercase',)),
+    'complex': PasswordPolicy(
+        min_length=12, max_length=12, classes=ALL_CLASSES,
+        min_counts=tuple((name, 1) for name in ALL_CLASSES),
+    ),
+    'strong': PasswordPolicy(
+        min_length=20, max_length=64, classes=ALL_CLASSES,
+        min_counts=(('uppercase', 2), ('lowercase', 2), ('digits', 2), ('symbols', 2)),
+        exclude_ambiguous=True,
+    ),
+    'pin': PasswordPolicy(min_length=6, max_length=12, classes=('digits',)),
+}
 
 
 class PasswordDirector:
-    def __init__(self, builder):
+    def __init__(self, builder=None, policy=None):
         self.builder = builder
+        self.policy = policy.compile() if isinstance(policy, PasswordPolicy) else policy
+
+    @classmethod
+    def for_policy(cls, name):
+        """Shared director for a named policy from PASSWORD_POLICIES."""
+        return _policy_director(name)
+
+    def create_password(self, length=None):
+        """Generate the password from the policy, or by calling the builder's build method."""
+        if self.policy is not None:
+            return self.policy.generate(length)
+        return self.builder.build()
+
 
-    def create_password(self):
-        """Generate the password by calling the builder's build method."""
-        return self.builder.build()
\ No newline at end of file
+@lru_cache(maxsize=None)
+def _policy_director(name):
+    if name not in PASSWORD_POLICIES:
+        raise KeyError(f"Unknown password policy: {name}")
+    return PasswordDirector(policy=PASSWORD_POLICIES[name])
@@ -0,0 +1,168 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Account, Identity, Login, SecureNote
+
+SEARCH_TABLE = 'vault_search'
+
+# Only non-secret fields are ever indexed: kind -> (model, title field, detail fields)
+SEARCH_SOURCES = {
+    'login': (Login, 'site_name', ['site_url', 'username']),
+    'secure_note': (SecureNote, 'title', []),
+    'identity': (Identity, 'full_name', []),
+    'account': (Account, 'name', []),
+}
+SEARCH_KINDS = list(SEARCH_SOURCES)
+SEARCH_MODEL_KINDS = {model: kind for kind, (model, _, _) in SEARCH_SOURCES.items()}
+
+# The owner column holds a "u<user id>" token, matching on it lets FTS5 intersect
+# the user's documents with the query terms instead of filtering afterwards
+CREATE_SEARCH_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "title, detail, owner, kind UNINDEXED, item_id UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+# bm25 column weights: title, detail, owner
+RANK_WEIGHTS = (10.0, 3.0, 0.0)
+
+SEARCH_LIMIT = 50
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def search_rowid(kind, item_id):
+    # One FTS row per item at a fixed rowid, so updates and deletes are rowid lookups
+    return item_id * len(SEARCH_KINDS) + SEARCH_KINDS.index(kind)
+
+
+def document(kind, item_id, user_id, title, detail_values):
+    detail = ' '.join(value for value in detail_values if value)
+    return (search_rowid(kind, item_id), title or '', detail, f'u{user_id}', kind, item_id)
+
+
+def indexed_fields(kind):
+    _, title_field, detail_fields = SEARCH_SOURCES[kind]
+    return {title_field, *detail_fields}
+
+
+def item_document(kind, item):
+    _, title_field, detail_fields = SEARCH_SOURCES[kind]
+    return document(kind, item.id, item.user_id, getattr(item, title_field),
+                    [getattr(item, field) for field in detail_fields])
+
+
+def search_enabled(conn=None):
+    """True when the database has the FTS5 search table (SQLite only)."""
+    conn = conn or connection
+    if conn.vendor != 'sqlite':
+        return False
+    enabled = getattr(conn, '_vault_search_enabled', None)
+    if enabled is None:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [SEARCH_TABLE])
+            enabled = cursor.fetchone() is not None
+        conn._vault_search_enabled = enabled
+    return enabled
+
+
+def write_documents(cursor, documents):
+    cursor.executemany(
+        f"INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, title, detail, owner, kind, item_id) "
+        "VALUES (%s, %s, %s, %s, %s, %s)",
+        documents,
+    )
+
+
+def index_items(kind, items):
+    """Add or refresh the search rows of saved items."""
+    if not items or not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        write_documents(cursor, [item_document(kind, item) for item in items])
+
+
+def remove_item(kind, item_id):
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [search_rowid(kind, item_id)])
+
+
+def match_expression(user_id, query):
+    # Every word of the query must match as a prefix, quoting keeps user input
+    # from being read as FTS5 syntax
+    terms = _TERM.findall(query)
+    if not terms:
+        return None
+    words = ' AND '.join(f'"{term}"*' for term in terms)
+    return f'owner:"u{user_id}" AND ({words})'
+
+
+def search_vault(user_id, query, limit=SEARCH_LIMIT):
+    """Return up to ``limit`` ranked ``{'kind', 'id', 'title', 'detail'}`` results."""
+    if not search_enabled():
+        return fallback_search(user_id, query, limit)
+    expression = match_expression(user_id, query)
+    if expression is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT kind, item_id, title, detail FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH %s ORDER BY bm25({SEARCH_TABLE}, %s, %s, %s) LIMIT %s",
+            [expression, *RANK_WEIGHTS, limit],
+        )
+        rows = cursor.fetchall()
+    return [{'kind': kind, 'id': item_id, 'title': title, 'detail': detail} for kind, item_id, title, detail in rows]
+
+
+def fallback_search(user_id, query, limit=SEARCH_LIMIT):
+    # Databases without FTS5: unranked substring matches on the same fields
+    terms = _TERM.findall(query)
+    if not terms:
+        return []
+    results = []
+    for kind, (model, title_field, detail_fields) in SEARCH_SOURCES.items():
+        condition = Q()
+        for term in terms:
+            term_condition = Q()
+            for field in [title_field] + detail_fields:
+                term_condition |= Q(**{f'{field}__icontains': term})
+            condition &= term_condition
+        items = model.objects.filter(condition, user_id=user_id).only('id', 'user_id', title_field, *detail_fields)
+        for item in items[:limit - len(results)]:
+            _, title, detail, _, _, _ = item_document(kind, item)
+            results.append({'kind': kind, 'id': item.id, 'title': title, 'detail': detail})
+        if len(results) >= limit:
+            break
+    return results
+
+
+def rebuild_index(user_id=None, chunk_size=1000):
+    """Recreate the search rows of every item (or one user's items), returns the row count."""
+    if not search_enabled():
+        return 0
+    count = 0
+    with connection.cursor() as cursor:
+        if user_id is None:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        else:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [f'owner:"u{user_id}"'])
+        for kind, (model, title_field, detail_fields) in SEARCH_SOURCES.items():
+            items = model.objects.only('id', 'user_id', title_field, *detail_fields).order_by('id')
+            if user_id is not None:
+                items = items.filter(user_id=user_id)
+            batch = []
+            for item in items.iterator(chunk_size=chunk_size):
+                batch.append(item_document(kind, item))
+                if len(batch) >= chunk_size:
+                    write_documents(cursor, batch)
+                    count += len(batch)
+                    batch = []
+            write_documents(cursor, batch)
+            count += len(batch)
+        # Merge the index segments written above
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return count
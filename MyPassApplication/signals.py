@@ -1,25 +1,14 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.utils.timezone import now
-from datetime import timedelta
-from .models import CreditCard, Identity, Notification, Account
+from .models import CreditCard, Identity, Notification, Account, Login, SecureNote
 from .observer_registry import ObserverRegistry
+from .search import SEARCH_MODEL_KINDS, index_items, indexed_fields, remove_item
+from .vault_summary import invalidate_vault_summary_on_commit
 import logging
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
-@receiver(post_save, sender=Account)
-def handle_password_created(sender, instance, created, **kwargs):
-    """
-    Notify observers when a new password account is created.
-    """
-    if created:
-        ObserverRegistry.notify_observers(
-            event="password_created",
-            data={"id": instance.id, "name": instance.name}
-        )
-
 @receiver(post_delete, sender=Account)
 def handle_password_deleted(sender, instance, **kwargs):  
    # Notify observers when a password account is deleted. 
@@ -29,45 +18,74 @@ def handle_password_deleted(sender, instance, **kwargs):
     )
     logger.info(f"Observer notified for password_deleted: {instance.id}, {instance.name}")
 
-def create_notification(user, message):   
+def create_notification(user_id, message):   
    # Utility function to create notifications, avoiding duplicates.   
-    if not Notification.objects.filter(user=user, message=message).exists():
-        Notification.objects.create(user=user, message=message)
+    return Notification.create_once(user_id, message)
 
-@receiver(post_save, sender=CreditCard)
-def notify_credit_card_expiration(sender, instance, **kwargs):
-      # Notify the user if their credit card is about to expire.
-    try:
-        if not instance.expiration_date:
-            return
+# Notification text for the expiry events CreditCard.save and Identity.save emit
+EXPIRY_MESSAGES = {
+    "credit_card_expiring": "Your credit card ending in {card_number} is expiring soon.",
+    "passport_expiring": "Your passport is expiring on {expiration_date}.",
+    "license_expiring": "Your driver’s license is expiring on {expiration_date}.",
+}
 
-        upcoming_date = now().date() + timedelta(days=30)
-        if instance.expiration_date <= upcoming_date:
-            message = f"Your credit card ending in {instance.card_number[-4:]} is expiring soon."
-            create_notification(user=instance.user, message=message)
+def notify_expiry(instance):
+   # Notify the user of the expirations that are new in this save of a card or
+   # identity. The model already decided which ones are new, no flag is checked
+   # or written here. Also called by the importer, whose bulk_create skips post_save.
+    try:
+        for _, event, data in getattr(instance, 'expiry_events', ()):
+            create_notification(instance.user_id, EXPIRY_MESSAGES[event].format(**data))
     except Exception as e:
-        logger.error(f"Error notifying credit card expiration: {e}")
+        logger.error(f"Error notifying {instance._meta.model_name} expiration: {e}")
 
+@receiver(post_save, sender=CreditCard)
 @receiver(post_save, sender=Identity)
-def notify_identity_expiration(sender, instance, **kwargs):   
-   # Notify the user if their passport or driver's license is about to expire. 
-    try:
-        upcoming_date = now().date() + timedelta(days=30)
-
-        # Passport expiration notification
-        if instance.passport_expiration_date and instance.passport_expiration_date <= upcoming_date:
-            if not instance.passport_notified:
-                message = f"Your passport is expiring on {instance.passport_expiration_date}."
-                create_notification(user=instance.user, message=message)
-                instance.passport_notified = True
-                instance.save(update_fields=["passport_notified"])
-
-        # License expiration notification
-        if instance.license_expiration_date and instance.license_expiration_date <= upcoming_date:
-            if not instance.license_notified:
-                message = f"Your driver’s license is expiring on {instance.license_expiration_date}."
-                create_notification(user=instance.user, message=message)
-                instance.license_notified = True
-                instance.save(update_fields=["license_notified"])
-    except Exception as e:
-        logger.error(f"Error notifying identity expiration: {e}")
+def notify_expiration(sender, instance, **kwargs):
+    notify_expiry(instance)
+
+
+# Drop the cached vault summary (vault_summary.py) when what it counts changes
+@receiver(post_save, sender=Login)
+@receiver(post_save, sender=SecureNote)
+@receiver(post_save, sender=Account)
+def count_vault_item_saved(sender, instance, created, **kwargs):
+    if created:
+        invalidate_vault_summary_on_commit(instance.user_id)
+
+
+@receiver(post_save, sender=CreditCard)
+@receiver(post_save, sender=Identity)
+def track_vault_expiry_saved(sender, instance, **kwargs):
+    invalidate_vault_summary_on_commit(instance.user_id)
+
+
+@receiver(post_delete, sender=Login)
+@receiver(post_delete, sender=SecureNote)
+@receiver(post_delete, sender=Account)
+@receiver(post_delete, sender=CreditCard)
+@receiver(post_delete, sender=Identity)
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def vault_summary_changed(sender, instance, **kwargs):
+    invalidate_vault_summary_on_commit(instance.user_id)
+
+
+# Keep the full-text search index (search.py) in step with the indexed fields
+@receiver(post_save, sender=Login)
+@receiver(post_save, sender=SecureNote)
+@receiver(post_save, sender=Identity)
+@receiver(post_save, sender=Account)
+def index_vault_item(sender, instance, update_fields=None, **kwargs):
+    kind = SEARCH_MODEL_KINDS[sender]
+    if update_fields is not None and not set(update_fields) & indexed_fields(kind):
+        return
+    index_items(kind, [instance])
+
+
+@receiver(post_delete, sender=Login)
+@receiver(post_delete, sender=SecureNote)
+@receiver(post_delete, sender=Identity)
+@receiver(post_delete, sender=Account)
+def unindex_vault_item(sender, instance, **kwargs):
+    remove_item(SEARCH_MODEL_KINDS[sender], instance.id)
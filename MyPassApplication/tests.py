@@ -1,6 +1,48 @@
-from datetime import date, timedelta
-from unittest.mock import Mock
-from django.test import TestCase
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+import math
+import os
+import string
+import tempfile
+import threading
+from unittest.mock import Mock, patch
+
+from cryptography.fernet import Fernet, MultiFernet
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from MyPassApplication.components import Dashboard, SavedPasswords
+from MyPassApplication.crypto import blind_index
+from MyPassApplication.database import apply_sqlite_pragmas
+from MyPassApplication.decryption import VaultDecryptionService
+from MyPassApplication.event_bus import EventBus
+from MyPassApplication.fields import DECRYPTION_ERROR, Ciphertext, DecryptionFailed
+from MyPassApplication.forms import LoginForm
+from MyPassApplication.mediators import UIMediator
+from MyPassApplication.models import (
+    Account, Checkpoint, CreditCard, Identity, Login, Notification, SecureNote, SessionManager, User,
+)
+from MyPassApplication.observer_registry import ObserverRegistry
+from MyPassApplication.password_builder import (
+    AMBIGUOUS_CHARACTERS, PASSWORD_POLICIES, ComplexPasswordBuilder, PasswordDirector, PasswordPolicy,
+    SimplePasswordBuilder, random_characters,
+)
+from MyPassApplication.search import SEARCH_TABLE, search_vault
+from MyPassApplication.signals import create_notification
+from MyPassApplication.vault_audit import audit_vault, score_passwords
+from MyPassApplication.vault_import import VaultImporter
+from MyPassApplication.vault_summary import get_vault_summary, summary_key
 
 # # Create your tests here.
 # from cryptography.fernet import Fernet
@@ -20,13 +62,16 @@ from django.test import TestCase
 # print(f"Decrypted password: {decrypted_password}")
 
 
-#test case for expiration dates
-from django.test import TestCase
-from django.utils import timezone
-from datetime import timedelta
-from unittest.mock import patch
-from MyPassApplication.models import Identity, User
+class LoggedInTestCase(TestCase):
+    # For view tests: logs the test client in the way session_login_required checks it
+    def log_in(self, user):
+        session = self.client.session
+        session['is_authenticated'] = True
+        session['user_id'] = user.id
+        session.save()
 
+
+#test case for expiration dates
 class IdentityExpirationTest(TestCase):
     def setUp(self):
         self.user = User.objects.create(username="testuser", password="password123")
@@ -34,41 +79,860 @@ class IdentityExpirationTest(TestCase):
     @patch('MyPassApplication.models.ObserverRegistry.notify_observers')
     def test_passport_expiration_notification(self, mock_notify):
         # Create an identity with a passport expiration date in the future
-        identity = Identity.objects.create(
-            user=self.user,
-            full_name="Future Passport User",
-            passport_expiration_date=timezone.now().date() + timedelta(days=31)
-        )
-        identity.check_passport_expiration()
+        with self.captureOnCommitCallbacks(execute=True):
+            identity = Identity.objects.create(
+                user=self.user,
+                full_name="Future Passport User",
+                passport_expiration_date=timezone.now().date() + timedelta(days=31)
+            )
         mock_notify.assert_not_called()  # No notification for a future expiration date
 
         # Update passport expiration date to within 30 days
         identity.passport_expiration_date = timezone.now().date() + timedelta(days=5)
-        identity.passport_notified = False
-        identity.save()
-        identity.check_passport_expiration()
-        mock_notify.assert_called_with(
+        with self.captureOnCommitCallbacks(execute=True):
+            identity.save()
+        mock_notify.assert_called_once_with(
             event="passport_expiring",
             data={"user_id": self.user.id, "expiration_date": identity.passport_expiration_date},
         )
+        self.assertTrue(Identity.objects.get(id=identity.id).passport_notified)
+
+        # Later saves do not notify again
+        with self.captureOnCommitCallbacks(execute=True):
+            identity.save()
+        self.assertEqual(mock_notify.call_count, 1)
 
     @patch('MyPassApplication.models.ObserverRegistry.notify_observers')
     def test_license_expiration_notification(self, mock_notify):
         # Create an identity with a license expiration date in the future
-        identity = Identity.objects.create(
-            user=self.user,
-            full_name="Future License User",
-            license_expiration_date=timezone.now().date() + timedelta(days=31)
-        )
-        identity.check_license_expiration()
+        with self.captureOnCommitCallbacks(execute=True):
+            identity = Identity.objects.create(
+                user=self.user,
+                full_name="Future License User",
+                license_expiration_date=timezone.now().date() + timedelta(days=31)
+            )
         mock_notify.assert_not_called()  # No notification for a future expiration date
 
         # Update license expiration date to within 30 days
         identity.license_expiration_date = timezone.now().date() + timedelta(days=5)
-        identity.license_notified = False
-        identity.save()
-        identity.check_license_expiration()
-        mock_notify.assert_called_with(
+        with self.captureOnCommitCallbacks(execute=True):
+            identity.save()
+        mock_notify.assert_called_once_with(
             event="license_expiring",
             data={"user_id": self.user.id, "expiration_date": identity.license_expiration_date},
         )
+        self.assertTrue(Identity.objects.get(id=identity.id).license_notified)
+
+    def test_expiring_identity_is_saved_with_one_write(self):
+        soon = timezone.now().date() + timedelta(days=5)
+        with CaptureQueriesContext(connection) as context:
+            Identity.objects.create(user=self.user, full_name="Both Expiring",
+                                    passport_expiration_date=soon, license_expiration_date=soon)
+        identity_writes = [query['sql'] for query in context.captured_queries
+                           if Identity._meta.db_table in query['sql'] and not query['sql'].startswith('SELECT')]
+        self.assertEqual(len(identity_writes), 1)
+        # The INSERT, its search index row and, for each of the two notifications, an
+        # INSERT in its own savepoint (a duplicate is rejected by the unique constraint)
+        self.assertEqual(len(context.captured_queries), 1 + 1 + 2 * 3)
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 2)
+
+    def test_expiring_credit_card_save_does_not_load_the_user(self):
+        with CaptureQueriesContext(connection) as context:
+            CreditCard.objects.create(user_id=self.user.id, cardholder_name="Card", card_number="4111111111111111",
+                                      expiration_date=timezone.now().date() + timedelta(days=5), cvv="123")
+        # The INSERT, then the notification INSERT inside its savepoint
+        self.assertEqual(len(context.captured_queries), 1 + 3)
+
+    @patch('MyPassApplication.observer_registry.ObserverRegistry.notify_observers')
+    def test_credit_card_is_notified_once_per_expiration_date(self, mock_notify):
+        soon = timezone.now().date() + timedelta(days=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            card = CreditCard.objects.create(user_id=self.user.id, cardholder_name="Card",
+                                             card_number="4111111111111111", expiration_date=soon, cvv="123")
+            card.cardholder_name = "Renamed"
+            card.save()
+        mock_notify.assert_called_once()
+
+        # A new date inside the window is notified again
+        card.expiration_date = soon + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            card.save(update_fields=['expiration_date'])
+        self.assertEqual(mock_notify.call_count, 2)
+        self.assertEqual(CreditCard.objects.get(id=card.id).expiration_notified_date, card.expiration_date)
+
+
+class SavedPasswordsDecryptionTest(LoggedInTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="vaultuser", password="password123")
+        cipher = Fernet(settings.ENCRYPTION_KEY)
+        for i in range(5):
+            Account.objects.create(
+                user=self.user,
+                name=f"site{i}",
+                password=cipher.encrypt(f"secret{i}".encode()).decode(),
+            )
+        self.log_in(self.user)
+
+    def test_batches_are_bounded(self):
+        service = VaultDecryptionService(batch_size=2, max_workers=2)
+        batches = list(service.iter_batches(Account.objects.filter(user=self.user).order_by('id')))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(batches[0][0]['decrypted_password'], "secret0")
+
+    @override_settings(VAULT_PAGE_SIZE=2)
+    def test_json_endpoint_is_paginated(self):
+        data = self.client.get(reverse('saved_passwords_json')).json()
+        self.assertEqual([entry['password'] for entry in data['results']], ["secret4", "secret3"])
+
+        data = self.client.get(reverse('saved_passwords_json'), {'after': data['next_cursor']}).json()
+        self.assertEqual([entry['password'] for entry in data['results']], ["secret2", "secret1"])
+
+        data = self.client.get(reverse('saved_passwords_json'), {'before': data['previous_cursor']}).json()
+        self.assertEqual([entry['password'] for entry in data['results']], ["secret4", "secret3"])
+        self.assertIsNone(data['previous_cursor'])
+
+    @override_settings(VAULT_PAGE_SIZE=2)
+    def test_list_views_use_keyset_pages(self):
+        for i in range(3):
+            Login.objects.create(user=self.user, site_name=f"login{i}", username="me", password="pw")
+        response = self.client.get(reverse('login_list'))
+        self.assertEqual([login.site_name for login in response.context['logins']], ["login2", "login1"])
+        response = self.client.get(reverse('login_list'), {'after': response.context['page_obj'].next_cursor})
+        self.assertEqual([login.site_name for login in response.context['logins']], ["login0"])
+        self.assertFalse(response.context['page_obj'].has_next())
+
+
+class BlindIndexDuplicateTest(LoggedInTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="indexuser", password="password123")
+        self.log_in(self.user)
+
+    def test_duplicate_custom_password_is_detected(self):
+        data = {'account_name': 'mail', 'custom_password': 'hunter22', 'save_to_vault': 'yes'}
+        self.client.post(reverse('create_password'), data)
+        response = self.client.post(reverse('create_password'), data)
+        self.assertContains(response, "This password already exists in your vault!")
+        self.assertEqual(Account.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Account.objects.get(user=self.user).password_index, blind_index('hunter22'))
+
+    def test_login_password_index_is_kept_in_sync(self):
+        login = Login.objects.create(user=self.user, site_name="bank", username="me", password="first")
+        login.password = "second"
+        login.save(update_fields=['password'])
+        login.refresh_from_db()
+        self.assertEqual(login.password_index, blind_index("second"))
+
+
+@override_settings(DEBUG=True)
+class UserLookupCacheTest(LoggedInTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="cacheuser", password="password123")
+        self.log_in(self.user)
+
+    def test_vault_requests_resolve_user_once(self):
+        login = Login.objects.create(user=self.user, site_name="bank", username="me", password="pw")
+        for url in (reverse('login_list'), reverse('login_detail', args=[login.pk]), reverse('saved_passwords')):
+            response = self.client.get(url)
+            self.assertLessEqual(int(response['X-User-Lookups']), 1, url)
+
+
+class RequestLocalSessionManagerTest(TestCase):
+    def test_each_request_gets_its_own_manager(self):
+        alice = User.objects.create(username="alice", password="password123")
+        bob = User.objects.create(username="bob", password="password123")
+        factory = RequestFactory()
+        first, second = factory.get('/'), factory.get('/')
+        first.session, second.session = SessionStore(), SessionStore()
+
+        first_manager = SessionManager.for_request(first)
+        second_manager = SessionManager.for_request(second)
+        first_manager.login(alice)
+        second_manager.login(bob)
+
+        self.assertIsNot(first_manager, second_manager)
+        self.assertIs(SessionManager.for_request(first), first_manager)
+        self.assertEqual(first_manager.get_current_user(), alice)
+        self.assertEqual(second_manager.get_current_user(), bob)
+
+    @override_settings(SESSION_ACTIVITY_RESOLUTION=10)
+    def test_last_activity_writes_are_coalesced(self):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        SessionManager(request).update_last_activity()
+        self.assertTrue(request.session.modified)
+        request.session.save()
+
+        started = timezone.now()
+        for seconds, saved in [(5, False), (11, True)]:
+            request.session = SessionStore(request.session.session_key)
+            with patch('django.utils.timezone.now', return_value=started + timedelta(seconds=seconds)):
+                manager = SessionManager(request)
+                self.assertFalse(manager.has_timed_out())
+                manager.update_last_activity()
+            self.assertEqual(request.session.modified, saved)
+
+
+# Every request saves last_activity, so both measured requests write the session
+@override_settings(SESSION_ACTIVITY_RESOLUTION=0)
+class IdentityListQueryCountTest(LoggedInTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="identityuser", password="password123")
+        self.log_in(self.user)
+
+    def add_identities(self, count):
+        today = timezone.now().date()
+        for i in range(count):
+            Identity.objects.create(
+                user=self.user,
+                full_name=f"Person {i}",
+                passport_expiration_date=today - timedelta(days=1),
+                license_expiration_date=today + timedelta(days=5),
+            )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('identity_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_query_count_is_constant(self):
+        self.add_identities(2)
+        small_count, response = self.count_queries()
+        self.assertEqual(len(list(response.context['messages'])), 4)
+
+        self.add_identities(10)
+        large_count, response = self.count_queries()
+        self.assertEqual(len(list(response.context['messages'])), 24)
+        self.assertEqual(small_count, large_count)
+
+
+class NotificationAcknowledgementTest(LoggedInTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="notifyuser", password="password123")
+        self.log_in(self.user)
+        for i in range(3):
+            Notification.objects.create(user=self.user, message=f"message {i}")
+
+    def test_vault_renders_then_marks_read(self):
+        response = self.client.get(reverse('vault_home'))
+        self.assertEqual(len(response.context['notifications']), 3)
+        self.assertContains(response, "message 2")
+        self.assertFalse(Notification.objects.filter(user=self.user, is_read=False).exists())
+
+    def test_json_endpoint_marks_batch_read(self):
+        other = User.objects.create(username="other", password="password123")
+        foreign = Notification.objects.create(user=other, message="not yours")
+        ids = list(Notification.objects.filter(user=self.user).values_list('id', flat=True)[:2])
+
+        response = self.client.post(
+            reverse('mark_notifications_read'),
+            data={'ids': ids + [foreign.id]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json(), {'updated': 2})
+        self.assertEqual(Notification.objects.filter(user=self.user, is_read=False).count(), 1)
+        self.assertFalse(Notification.objects.get(id=foreign.id).is_read)
+
+    def test_json_endpoint_rejects_malformed_bodies(self):
+        for body in ['[1, 2]', '7', '{"ids": [1, true]}', '{"ids": "1"}', '{"ids": [1,', '\xff']:
+            response = self.client.post(reverse('mark_notifications_read'), data=body,
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+        self.assertEqual(Notification.objects.filter(user=self.user, is_read=False).count(), 3)
+
+
+class CheckExpirationsCommandTest(TestCase):
+    def setUp(self):
+        soon = timezone.now().date() + timedelta(days=5)
+        self.users = []
+        for name in ("first", "second"):
+            user = User.objects.create(username=name, email=f"{name}@example.com")
+            CreditCard.objects.create(user=user, cardholder_name=name, card_number="4111111111111111",
+                                      expiration_date=soon, cvv="123")
+            Identity.objects.create(user=user, full_name=name, passport_expiration_date=soon,
+                                    license_expiration_date=soon)
+            self.users.append(user)
+
+    def test_sends_one_digest_per_user(self):
+        out = StringIO()
+        call_command('check_expirations', batch_size=1, stdout=out)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ["first@example.com", "second@example.com"])
+        body = mail.outbox[0].body
+        self.assertIn("credit card ending in 1111", body)
+        self.assertIn("passport", body)
+        self.assertIn("driver's license", body)
+        self.assertIn("6 expiring items for 2 users", out.getvalue())
+
+    def test_second_run_only_notifies_new_expirations(self):
+        call_command('check_expirations', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+
+        out = StringIO()
+        call_command('check_expirations', stdout=out)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn("0 expiring items for 0 users", out.getvalue())
+
+        card = CreditCard.objects.get(user=self.users[0])
+        CreditCard.objects.filter(id=card.id).update(expiration_date=card.expiration_date + timedelta(days=1))
+        call_command('check_expirations', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[-1].to, ["first@example.com"])
+        self.assertEqual(Checkpoint.objects.get(name='check_expirations').value['last_run'],
+                         timezone.now().date().isoformat())
+
+    def test_dry_run_sends_nothing(self):
+        out = StringIO()
+        call_command('check_expirations', dry_run=True, stdout=out)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertIn("Dry run: 6 expiring items for 2 users", out.getvalue())
+
+
+class EventBusTest(TestCase):
+    def test_events_are_dispatched_by_workers(self):
+        received = []
+        bus = EventBus(lambda event, data: received.append((event, data)), workers=2)
+        bus.start()
+        for i in range(10):
+            bus.publish("password_created", {"id": i})
+        bus.drain()
+        bus.stop()
+        self.assertEqual(sorted(data["id"] for _, data in received), list(range(10)))
+        self.assertEqual(bus.snapshot()['dispatched'], {"password_created": 10})
+
+    def test_per_event_limit_drops_or_runs_inline(self):
+        release = threading.Event()
+        calls = []
+
+        def dispatch(event, data):
+            if data == "slow":
+                release.wait(5)
+            calls.append(data)
+
+        bus = EventBus(dispatch, workers=1, event_limits={"password_created": 1})
+        bus.start()
+        bus.publish("password_created", "slow")
+        self.assertFalse(bus.publish("password_created", "dropped"))
+        self.assertTrue(bus.publish("password_deleted", "other type"))
+        release.set()
+        bus.drain()
+        bus.stop()
+        self.assertEqual(bus.snapshot()['dropped'], {"password_created": 1})
+        self.assertNotIn("dropped", calls)
+
+        inline = EventBus(lambda event, data: calls.append(data), workers=0, queue_size=1, overflow='sync')
+        inline.publish("password_created", "queued")
+        inline.publish("password_created", "inline")
+        self.assertIn("inline", calls)
+        self.assertEqual(inline.snapshot()['overflowed'], {"password_created": 1})
+
+
+class AccountCreationEventTest(LoggedInTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="eventuser", password="password123")
+        self.log_in(self.user)
+
+    @patch('MyPassApplication.observer_registry.ObserverRegistry.dispatch')
+    def test_create_password_is_one_insert_and_one_event(self, mock_dispatch):
+        data = {'account_name': 'mail', 'complexity': 'complex', 'save_to_vault': 'yes'}
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as context:
+                self.client.post(reverse('create_password'), data)
+            mock_dispatch.assert_not_called()  # nothing is emitted before the commit
+
+        writes = [query['sql'] for query in context.captured_queries
+                  if Account._meta.db_table in query['sql'] and not query['sql'].startswith('SELECT')]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('INSERT'))
+        account = Account.objects.get(user=self.user)
+        self.assertTrue(account.suggested)
+        mock_dispatch.assert_called_once_with("password_created", {"id": account.id, "name": "mail"})
+
+    @patch('MyPassApplication.observer_registry.ObserverRegistry.dispatch')
+    def test_duplicate_events_are_merged_within_a_transaction(self, mock_dispatch):
+        with self.captureOnCommitCallbacks(execute=True):
+            ObserverRegistry.notify_on_commit("password_created", {"id": 1}, key=1)
+            ObserverRegistry.notify_on_commit("password_created", {"id": 1}, key=1)
+            ObserverRegistry.notify_on_commit("password_created", {"id": 2}, key=2)
+        self.assertEqual(mock_dispatch.call_count, 2)
+
+    @patch('MyPassApplication.observer_registry.ObserverRegistry.dispatch')
+    def test_rolled_back_event_does_not_absorb_a_later_one(self, mock_dispatch):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    ObserverRegistry.notify_on_commit("password_created", {"id": 1}, key=1)
+                    raise DatabaseError("rolled back")
+            except DatabaseError:
+                pass
+            ObserverRegistry.notify_on_commit("password_created", {"id": 1, "retry": True}, key=1)
+        mock_dispatch.assert_called_once_with("password_created", {"id": 1, "retry": True})
+
+
+class UIMediatorDispatchTest(TestCase):
+    def test_events_are_routed_through_the_table(self):
+        mediator = UIMediator()
+        saved_passwords, dashboard = Mock(), Mock()
+        mediator.register("SavedPasswords", saved_passwords)
+        mediator.register("Dashboard", dashboard)
+
+        mediator.notify("test", "password_created", {"id": 1})
+        mediator.notify("test", "identity_created", {"id": 2})
+        mediator.notify("test", "unknown_event", {"id": 3})
+
+        saved_passwords.add_password.assert_called_once_with({"id": 1})
+        self.assertEqual(dashboard.refresh_dashboard.call_count, 2)
+
+    def test_re_entrant_events_do_not_loop(self):
+        mediator = UIMediator()
+        mediator.register("SavedPasswords", SavedPasswords(mediator))
+        mediator.register("Dashboard", Dashboard(mediator))
+        calls = []
+        mediator.subscribe("password_updated", calls.append)
+
+        # update_password_list notifies "password_updated" again from inside the handler
+        mediator.notify("test", "password_updated", {"id": 1})
+        self.assertEqual(calls, [{"id": 1}])
+
+
+class VaultSummaryCacheTest(LoggedInTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="summaryuser", password="password123")
+
+    def test_summary_is_rebuilt_after_changes_commit(self):
+        get_vault_summary(self.user.id)  # warm the cache
+        with self.captureOnCommitCallbacks(execute=True):
+            Login.objects.create(user=self.user, site_name="bank", username="me", password="pw")
+            note = SecureNote.objects.create(user=self.user, title="wifi", content="secret")
+            SecureNote.objects.create(user=self.user, title="door", content="1234")
+            note.delete()
+            soon = timezone.now().date() + timedelta(days=10)
+            CreditCard.objects.create(user=self.user, cardholder_name="me", card_number="4111111111111111",
+                                      expiration_date=soon, cvv="123")
+            # Not dropped before the commit
+            self.assertIsNotNone(cache.get(summary_key(self.user.id)))
+
+        summary = get_vault_summary(self.user.id)
+        self.assertEqual(summary['logins'], 1)
+        self.assertEqual(summary['secure_notes'], 1)
+        self.assertEqual(summary['credit_cards'], 1)
+        self.assertEqual(summary['next_expiry'], soon)
+        self.assertEqual(summary['unread_notifications'], 1)  # the card expiry notification
+        with self.assertNumQueries(0):
+            get_vault_summary(self.user.id)
+
+    def test_vault_page_renders_summary(self):
+        Login.objects.create(user=self.user, site_name="bank", username="me", password="pw")
+        Notification.objects.create(user=self.user, message="Card expiring")
+        self.log_in(self.user)
+        get_vault_summary(self.user.id)  # warm, with one unread notification
+        response = self.client.get(reverse('vault_home'))
+        self.assertContains(response, "Logins: 1")
+        # The page shows the notification and counts it as already read
+        self.assertContains(response, "Card expiring")
+        self.assertContains(response, "Unread notifications: 0")
+
+
+class VaultAuditTest(TestCase):
+    def test_scores_are_vectorized_per_password(self):
+        scores = score_passwords(["abc", "Abc123!?xyzQ", "abc", "mybank99"],
+                                 ["mail", "work", "chat", "MyBank"], ["", "", "", ""])
+        self.assertEqual(list(scores['length']), [3, 12, 3, 8])
+        self.assertEqual(list(scores['classes']), [1, 4, 1, 2])
+        self.assertEqual(list(scores['reuse_count']), [2, 1, 2, 1])
+        self.assertEqual(list(scores['similar']), [False, False, False, True])
+        self.assertAlmostEqual(scores['entropy'][1], 12 * math.log2(95))
+
+    def test_long_passwords_are_scored_in_full(self):
+        prefix = "a" * 300
+        scores = score_passwords([prefix + "1", prefix + "2", prefix + "!", "short"])
+        self.assertEqual(list(scores['length']), [301, 301, 301, 5])
+        self.assertEqual(list(scores['reuse_count']), [1, 1, 1, 1])  # they differ past 128 characters
+        self.assertEqual(list(scores['classes']), [2, 2, 2, 1])
+
+    def test_audit_covers_accounts_and_logins(self):
+        user = User.objects.create(username="audituser", password="password123")
+        cipher = Fernet(settings.ENCRYPTION_KEY)
+        Account.objects.create(user=user, name="mail", password=cipher.encrypt(b"abc123").decode())
+        Login.objects.create(user=user, site_name="bank", username="me", password="abc123")
+        Login.objects.create(user=user, site_name="shop", username="me", password="abc123")
+        with patch.object(Ciphertext, 'decrypt') as lazy_decrypt:
+            report = audit_vault(user.id, VaultDecryptionService(batch_size=2))
+        lazy_decrypt.assert_not_called()  # login tokens are decrypted in batches, not row by row
+        self.assertEqual(report['total'], 3)
+        self.assertEqual(report['reused_count'], 3)
+        self.assertEqual(report['reuse_clusters'], [["mail", "bank", "shop"]])
+        self.assertEqual(report['weak_count'], 3)
+
+
+class PasswordBuilderTest(TestCase):
+    def test_build_many_honours_length_and_classes(self):
+        passwords = ComplexPasswordBuilder().set_length(20).build_many(200)
+        self.assertEqual(len(passwords), 200)
+        for password in passwords:
+            self.assertEqual(len(password), 20)
+            for chars in (string.ascii_uppercase, string.ascii_lowercase, string.digits, string.punctuation):
+                self.assertTrue(set(password) & set(chars))
+        self.assertEqual(len(SimplePasswordBuilder().build()), 8)
+
+    def test_random_characters_cover_the_pool_evenly(self):
+        counts = Counter(random_characters("abc", 30000))
+        self.assertEqual(set(counts), {"a", "b", "c"})
+        for count in counts.values():
+            self.assertAlmostEqual(count / 30000, 1 / 3, delta=0.02)
+
+
+class PasswordPolicyTest(TestCase):
+    def test_strong_policy_meets_minimums_without_ambiguous_characters(self):
+        passwords = PASSWORD_POLICIES['strong'].compile().generate_many(100)
+        for password in passwords:
+            self.assertEqual(len(password), 20)
+            self.assertFalse(set(password) & set(AMBIGUOUS_CHARACTERS))
+            for chars in (string.ascii_uppercase, string.ascii_lowercase, string.digits, string.punctuation):
+                self.assertGreaterEqual(sum(char in chars for char in password), 2)
+
+    def test_policies_are_compiled_once_and_validated(self):
+        self.assertIs(PasswordDirector.for_policy('pin'), PasswordDirector.for_policy('pin'))
+        self.assertTrue(PasswordDirector.for_policy('pin').create_password().isdigit())
+        with self.assertRaises(ValueError):
+            PasswordPolicy(min_length=2, max_length=2, min_counts=(('digits', 3),)).compile()
+
+    def test_builder_honours_include_flags(self):
+        password = ComplexPasswordBuilder().include_numbers().set_length(30).build()
+        self.assertTrue(password.isdigit())
+
+
+class VaultImportTest(LoggedInTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="importer", password="pw")
+
+    def test_import_encrypts_validates_and_emits_one_event_per_batch(self):
+        rows = [
+            '{"type": "account", "name": "mail", "password": "s3cret-pass"}',
+            '{"type": "login", "name": "Forum", "url": "https://forum.example.com", "login_username": "me", "login_password": "pw1"}',
+            '{"type": "secure_note", "title": "Wifi", "content": "hunter2"}',
+            '{"type": "credit_card", "cardholder_name": "Me"}',
+            'not json',
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            handle.write('\n'.join(rows))
+        self.addCleanup(os.unlink, handle.name)
+
+        observer = Mock()
+        ObserverRegistry.register_observer("vault_imported", observer)
+        self.addCleanup(ObserverRegistry._observers.pop, "vault_imported")
+        out, err = StringIO(), StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_vault', handle.name, user="importer", batch_size=2,
+                         stdout=out, stderr=err)
+
+        account = Account.objects.get(user=self.user)
+        self.assertEqual(Fernet(settings.ENCRYPTION_KEY).decrypt(account.password.encode()).decode(), "s3cret-pass")
+        self.assertEqual(account.password_index, blind_index("s3cret-pass"))
+        login = Login.objects.get(user=self.user)
+        self.assertEqual((login.site_name, login.username, login.password_index), ("Forum", "me", blind_index("pw1")))
+        self.assertEqual(SecureNote.objects.filter(user=self.user).count(), 1)
+        # Rows 1-2 and 3-4 are two batches, row 4 fails validation and row 5 is not JSON
+        self.assertEqual(observer.update.call_count, 2)
+        self.assertIn("row 4: card_number", err.getvalue())
+        self.assertIn("row 5: Invalid JSON", err.getvalue())
+        self.assertIn("2 errors", out.getvalue())
+
+    def test_imported_cards_and_identities_get_their_expiry_notices(self):
+        soon = (timezone.now().date() + timedelta(days=5)).isoformat()
+        records = [
+            (1, {"type": "credit_card", "cardholder_name": "Me", "card_number": "4111111111111111",
+                 "expiration_date": soon, "cvv": "123"}, None),
+            (2, {"type": "identity", "full_name": "Me", "passport_expiration_date": soon}, None),
+        ]
+        with patch('MyPassApplication.observer_registry.ObserverRegistry.notify_observers') as notify:
+            with self.captureOnCommitCallbacks(execute=True):
+                VaultImporter(self.user).run(records)
+        events = [call.kwargs['event'] for call in notify.call_args_list]
+        self.assertCountEqual(events, ["credit_card_expiring", "passport_expiring", "vault_imported"])
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 2)
+        self.assertTrue(Identity.objects.get(user=self.user).passport_notified)
+
+    @override_settings(VAULT_IMPORT_INLINE_BYTES=10)
+    def test_large_upload_is_imported_in_the_background(self):
+        self.log_in(self.user)
+        upload = SimpleUploadedFile("notes.jsonl", b'{"type": "secure_note", "title": "Wifi", "content": "hunter2"}')
+        jobs = []
+        with patch('MyPassApplication.vault_import.import_executor.submit',
+                   side_effect=lambda fn, *args: jobs.append((fn, args))):
+            response = self.client.post(reverse('import_vault'), {'file': upload})
+        self.assertRedirects(response, reverse('vault_home'), fetch_redirect_response=False)
+        self.assertFalse(SecureNote.objects.filter(user=self.user).exists())  # nothing on the request thread
+
+        (job, args), = jobs
+        job(*args)
+        self.assertEqual(SecureNote.objects.get(user=self.user).content, "hunter2")
+        self.assertFalse(os.path.exists(args[1]))
+        self.assertIn("1 items imported", Notification.objects.get(user=self.user).message)
+
+
+@override_settings(VAULT_EXPORT_KDF_ITERATIONS=1000)
+class VaultExportTest(LoggedInTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="exporter", password="pw")
+        User.objects.create_user(username="restored", password="pw")
+        cipher = Fernet(settings.ENCRYPTION_KEY)
+        Account.objects.create(user=self.user, name="mail", password=cipher.encrypt(b"s3cret").decode())
+        for i in range(3):
+            Login.objects.create(user=self.user, site_name=f"site{i}", username="me", password=f"pw{i}")
+        SecureNote.objects.create(user=self.user, title="Wifi", content="line one\nline two")
+        handle = tempfile.NamedTemporaryFile(suffix='.enc', delete=False)
+        handle.close()
+        self.path = handle.name
+        self.addCleanup(os.unlink, self.path)
+
+    def export(self, **options):
+        call_command('export_vault', self.path, user="exporter", passphrase="correct horse",
+                     chunk_size=1, stdout=StringIO(), **options)
+
+    def test_frames_are_encrypted_and_an_interrupted_export_resumes(self):
+        self.export(format='csv', gzip=True)
+        with open(self.path, 'rb') as stream:
+            data = stream.read()
+        self.assertNotIn(b"site0", data)
+        # Header, column names and one frame per row
+        self.assertEqual(data.count(b"\n"), 2 + 5)
+
+        # Cut the file in the middle of the fourth row's frame and resume
+        lines = data.split(b"\n")
+        with open(self.path, 'wb') as stream:
+            stream.write(b"\n".join(lines[:5]) + b"\n" + lines[5][:20])
+        self.export(resume=True)
+        with open(self.path, 'rb') as stream:
+            self.assertEqual(stream.read().count(b"\n"), 2 + 5)
+
+        call_command('import_vault', self.path, user="restored", passphrase="correct horse",
+                     stdout=StringIO(), stderr=StringIO())
+        restored = User.objects.get(username="restored")
+        self.assertEqual(sorted(Login.objects.filter(user=restored).values_list('site_name', flat=True)),
+                         ["site0", "site1", "site2"])
+        self.assertEqual(SecureNote.objects.get(user=restored).content, "line one\nline two")
+        account = Account.objects.get(user=restored)
+        self.assertEqual(Fernet(settings.ENCRYPTION_KEY).decrypt(account.password.encode()), b"s3cret")
+
+    def test_resuming_inside_the_column_frame_writes_the_column_names_again(self):
+        self.export(format='csv')
+        with open(self.path, 'rb') as stream:
+            lines = stream.read().split(b"\n")
+        with open(self.path, 'wb') as stream:
+            stream.write(lines[0] + b"\n" + lines[1][:20])
+        self.export(resume=True)
+        with open(self.path, 'rb') as stream:
+            self.assertEqual(stream.read().count(b"\n"), 2 + 5)
+
+        call_command('import_vault', self.path, user="restored", passphrase="correct horse",
+                     stdout=StringIO(), stderr=StringIO())
+        restored = User.objects.get(username="restored")
+        self.assertEqual(Login.objects.filter(user=restored).count(), 3)
+        self.assertEqual(SecureNote.objects.get(user=restored).content, "line one\nline two")
+
+    def test_export_view_streams_the_response(self):
+        self.log_in(self.user)
+        response = self.client.post(reverse('export_vault'), {'passphrase': 'correct horse', 'format': 'jsonl'})
+        self.assertTrue(response.streaming)
+        body = b"".join(response.streaming_content)
+        # Header and one frame per type, the default chunk holds every row
+        self.assertEqual(body.count(b"\n"), 1 + 3)
+        self.assertNotIn(b"s3cret", body)
+
+
+class EncryptedFieldTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cipher", password="pw")
+        self.login = Login.objects.create(user=self.user, site_name="Site", username="me", password="pw-123")
+
+    def test_values_are_stored_encrypted_and_decrypted_on_first_read(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT password FROM {Login._meta.db_table} WHERE id = %s", [self.login.id])
+            stored = cursor.fetchone()[0]
+        self.assertNotEqual(stored, "pw-123")
+        self.assertEqual(Fernet(settings.ENCRYPTION_KEY).decrypt(stored.encode()), b"pw-123")
+
+        with patch.object(Ciphertext, 'decrypt', autospec=True, side_effect=Ciphertext.decrypt) as decrypt:
+            logins = list(Login.objects.filter(user=self.user))
+            self.assertEqual(decrypt.call_count, 0)
+            self.assertEqual(logins[0].password, "pw-123")
+            self.assertEqual(logins[0].password, "pw-123")
+            self.assertEqual(decrypt.call_count, 1)
+
+    def test_saving_without_reading_keeps_the_token_and_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT password FROM {Login._meta.db_table} WHERE id = %s", [self.login.id])
+            stored = cursor.fetchone()[0]
+        login = Login.objects.get(id=self.login.id)
+        login.site_name = "Renamed"
+        with patch.object(Ciphertext, 'decrypt') as decrypt:
+            login.save()
+        decrypt.assert_not_called()
+        login = Login.objects.get(id=self.login.id)
+        self.assertEqual(login.site_name, "Renamed")
+        self.assertEqual(login.__dict__['password'], Ciphertext(stored))
+        self.assertEqual(login.password_index, blind_index("pw-123"))
+
+    def test_undecryptable_value_is_never_written_back(self):
+        other_key = Fernet(Fernet.generate_key())
+        foreign = other_key.encrypt(b"pw-123").decode()
+        Login.objects.filter(id=self.login.id).update(password=Ciphertext(foreign))
+
+        login = Login.objects.get(id=self.login.id)
+        self.assertEqual(login.password, DECRYPTION_ERROR)
+        # Submitting the edit form with the placeholder unchanged keeps the token
+        form = LoginForm({'site_name': "Renamed", 'username': "me", 'password': login.password}, instance=login)
+        self.assertTrue(form.is_valid())
+        form.save()
+        # Assigning it back is a no-op, copying it to another row is refused
+        login.password = login.password
+        login.save()
+        with self.assertRaises(DecryptionFailed), transaction.atomic():
+            SecureNote.objects.create(user=self.user, title="copy", content=login.password)
+
+        login = Login.objects.get(id=self.login.id)
+        self.assertEqual(login.site_name, "Renamed")
+        self.assertEqual(login.__dict__['password'], Ciphertext(foreign))
+
+
+class KeyRotationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="rotator", password="pw")
+        self.old_key = settings.ENCRYPTION_KEY
+        self.new_key = Fernet.generate_key().decode()
+        Account.objects.create(user=self.user, name="mail",
+                               password=Fernet(self.old_key).encrypt(b"s3cret").decode())
+        for i in range(3):
+            Login.objects.create(user=self.user, site_name=f"site{i}", username="me", password=f"pw{i}")
+        SecureNote.objects.create(user=self.user, title="Wifi", content="hunter2")
+
+    def raw_tokens(self):
+        tokens = []
+        with connection.cursor() as cursor:
+            for model, column in ((Account, 'password'), (Login, 'password'), (SecureNote, 'content')):
+                cursor.execute(f"SELECT {column} FROM {model._meta.db_table}")
+                tokens.extend(row[0] for row in cursor.fetchall())
+        return tokens
+
+    def test_rotation_reencrypts_with_the_new_key_and_resumes(self):
+        with override_settings(ENCRYPTION_KEYS=[self.new_key, self.old_key]):
+            self.assertEqual(MultiFernet([Fernet(self.new_key), Fernet(self.old_key)]).decrypt(
+                self.raw_tokens()[0].encode()), b"s3cret")
+            out = StringIO()
+            call_command('rotate_keys', chunk_size=2, stdout=out)
+            self.assertIn("5 of 5 rows re-encrypted", out.getvalue())
+            self.assertIn("rows/s", out.getvalue())
+
+            new = Fernet(self.new_key)
+            for token in self.raw_tokens():
+                new.decrypt(token.encode())
+            self.assertEqual(Login.objects.get(site_name="site1").password, "pw1")
+            self.assertEqual(Login.objects.get(site_name="site1").password_index, blind_index("pw1"))
+
+            # Progress was saved per model, a second run has nothing left to do
+            checkpoint = Checkpoint.objects.get(name="rotate_keys")
+            self.assertTrue(checkpoint.value['completed'])
+            self.assertEqual(checkpoint.value['positions']['MyPassApplication.Login'], Login.objects.latest('id').id)
+            out = StringIO()
+            call_command('rotate_keys', stdout=out)
+            self.assertIn("0 rows to check", out.getvalue())
+
+    def test_rotated_tokens_are_stored_as_they_are(self):
+        rotate, rotated = MultiFernet.rotate, []
+
+        def record(cipher, token):
+            rotated.append(rotate(cipher, token).decode())
+            return rotated[-1].encode()
+
+        with override_settings(ENCRYPTION_KEYS=[self.new_key, self.old_key]):
+            with patch.object(MultiFernet, 'rotate', autospec=True, side_effect=record):
+                call_command('rotate_keys', stdout=StringIO())
+        self.assertEqual(len(rotated), 5)
+        self.assertCountEqual(self.raw_tokens(), rotated)
+
+
+class NotificationDedupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="dedup", password="pw")
+
+    def test_duplicate_messages_are_ignored_without_breaking_the_transaction(self):
+        with transaction.atomic():
+            first = create_notification(self.user.id, "Your passport is expiring.")
+            self.assertIsNone(create_notification(self.user.id, "Your passport is expiring."))
+            self.assertIsNotNone(create_notification(self.user.id, "Your license is expiring."))
+        self.assertEqual(first.dedup_key, Notification.make_dedup_key("Your passport is expiring."))
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 2)
+
+    @override_settings(NOTIFICATION_RETENTION_DAYS=30)
+    def test_prune_deletes_only_old_read_notifications(self):
+        old = timezone.now() - timedelta(days=31)
+        for i in range(5):
+            create_notification(self.user.id, f"old read {i}")
+        create_notification(self.user.id, "old unread")
+        create_notification(self.user.id, "new read")
+        Notification.objects.exclude(message="new read").update(timestamp=old)
+        Notification.objects.exclude(message="old unread").update(is_read=True)
+
+        out = StringIO()
+        call_command('prune_notifications', batch_size=2, stdout=out)
+        self.assertIn("Pruned 5", out.getvalue())
+        self.assertEqual(set(Notification.objects.values_list('message', flat=True)), {"old unread", "new read"})
+
+
+class VaultSearchTest(LoggedInTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="searcher", password="pw")
+        self.other = User.objects.create(username="other", password="pw")
+        self.github = Login.objects.create(user=self.user, site_name="GitHub", site_url="https://github.com",
+                                           username="octo", password="gh-secret-pass")
+        Login.objects.create(user=self.user, site_name="Bank", site_url="https://bank.example.com",
+                             username="octo-github-backup", password="pw")
+        SecureNote.objects.create(user=self.user, title="Github recovery codes", content="1234-5678")
+        Login.objects.create(user=self.other, site_name="GitHub", username="someone", password="pw")
+
+    def test_results_are_ranked_and_limited_to_the_user(self):
+        results = search_vault(self.user.id, "git")
+        self.assertEqual([result['title'] for result in results][-1], "Bank")  # only matched in detail
+        self.assertEqual(len(results), 3)
+        self.assertEqual(search_vault(self.user.id, 'hub "OR owner'), [])
+
+    def test_index_follows_edits_and_deletes_and_holds_no_secrets(self):
+        self.github.site_name = "Codeberg"
+        self.github.save()
+        self.assertEqual([r['title'] for r in search_vault(self.user.id, "codeberg")], ["Codeberg"])
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", ['"secret"'])
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.github.delete()
+        self.assertEqual(search_vault(self.user.id, "codeberg"), [])
+
+    def test_json_view_and_rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.log_in(self.user)
+        response = self.client.get(reverse('vault_search'), {'q': 'recovery', 'format': 'json'})
+        results = response.json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['kind'], 'secure_note')
+        self.assertNotIn("1234", response.content.decode())
+
+
+class SqlitePragmaTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_configured_pragmas_are_applied_to_new_connections(self):
+        # TestCase runs inside a transaction, so only PRAGMAs allowed there are used
+        defaults = {'busy_timeout': self.pragma('busy_timeout'), 'cache_size': self.pragma('cache_size')}
+        with override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234, 'cache_size': -4000}):
+            apply_sqlite_pragmas(sender=None, connection=connection)
+        self.assertEqual(self.pragma('busy_timeout'), 1234)
+        self.assertEqual(self.pragma('cache_size'), -4000)
+        with override_settings(SQLITE_PRAGMAS=defaults):
+            apply_sqlite_pragmas(sender=None, connection=connection)
+        self.assertEqual(self.pragma('busy_timeout'), defaults['busy_timeout'])
@@ -19,6 +19,7 @@ urlpatterns = [
     path('account/', views.account, name='account'),
     path('change-password/', views.change_password, name='change_password'),
     path('saved-passwords/', views.saved_passwords, name='saved_passwords'),
+    path('saved-passwords/json/', views.saved_passwords_json, name='saved_passwords_json'),
     path('logout/', views.logout_view, name='logout'),
 
     # Password Reset via Security Questions
@@ -30,9 +31,14 @@ urlpatterns = [
 
     # Vault Home
     path('vault/', views.vault, name='vault_home'),
+    path('vault/health/', views.vault_health, name='vault_health'),
+    path('vault/import/', views.import_vault, name='import_vault'),
+    path('vault/export/', views.export_vault, name='export_vault'),
+    path('vault/search/', views.vault_search, name='vault_search'),
 
     # Notification URL
     path('notifications/mark-read/<int:notification_id>/', views.mark_notification_read, name='mark_notification_read'),
+    path('notifications/mark-read/', views.mark_notifications_read, name='mark_notifications_read'),
 
     # Login URLs
     path('vault/logins/', LoginListView.as_view(), name='login_list'),
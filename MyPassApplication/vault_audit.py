@@ -0,0 +1,169 @@
+import math
+
+import numpy as np
+
+from .decryption import DECRYPTION_ERROR, VaultDecryptionService
+from .fields import Ciphertext
+from .models import Account, Login
+
+# Passwords are scored in buckets of similar length, each one a code point matrix
+# as wide as its longest password (a power of two, at least MIN_WIDTH), so one
+# very long password does not widen the matrix of every other one
+MIN_WIDTH = 16
+
+# Rough alphabet size contributed by each character class, used for the entropy estimate
+CLASS_POOL_SIZES = {'lowercase': 26, 'uppercase': 26, 'digits': 10, 'symbols': 33, 'other': 100}
+
+STRENGTH_LEVELS = ((28, 'very weak'), (36, 'weak'), (60, 'reasonable'), (math.inf, 'strong'))
+
+# Names shorter than this are not checked for similarity, they match too much
+MIN_SIMILARITY_LENGTH = 3
+
+
+def collect_vault_entries(user_id, decryption_service=None, batch_size=500):
+    """Yield (kind, id, label, username, password) for every Account and Login of a user."""
+    decryption_service = decryption_service or VaultDecryptionService(batch_size=batch_size)
+    accounts = Account.objects.filter(user_id=user_id).only('id', 'name', 'password')
+    for entry in decryption_service.iter_entries(accounts):
+        if entry['decrypted_password'] == DECRYPTION_ERROR:
+            continue
+        account = entry['account']
+        yield ('account', account.id, account.name, '', entry['decrypted_password'])
+
+    # Login passwords are decrypted a batch at a time too, from the raw tokens
+    logins = Login.objects.filter(user_id=user_id).values_list('id', 'site_name', 'username', 'password')
+    batch = []
+    for row in logins.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield from login_entries(batch, decryption_service)
+            batch = []
+    yield from login_entries(batch, decryption_service)
+
+
+def login_entries(rows, decryption_service):
+    tokens = [password.token if isinstance(password, Ciphertext) else password for _, _, _, password in rows]
+    passwords = decryption_service.decrypt_tokens(tokens)
+    for (login_id, site_name, username, _), password in zip(rows, passwords):
+        if password != DECRYPTION_ERROR:
+            yield ('login', login_id, site_name, username, password)
+
+
+def contains(haystack, needle):
+    # Vectorized case-insensitive "needle in haystack" ignoring too short needles
+    needle_long_enough = np.char.str_len(needle) >= MIN_SIMILARITY_LENGTH
+    return needle_long_enough & (np.char.find(haystack, needle) >= 0)
+
+
+def score_bucket(passwords, names, usernames, width):
+    # NumPy stores 'U' strings as zero padded UTF-32, viewing them as uint32 gives a
+    # (n, width) code point matrix without any per-character Python work
+    text = np.array(passwords, dtype=f'U{width}')
+    cps = text.view(np.uint32).reshape(len(passwords), width)
+
+    lowercase = ((cps >= 97) & (cps <= 122)).any(axis=1)
+    uppercase = ((cps >= 65) & (cps <= 90)).any(axis=1)
+    digits = ((cps >= 48) & (cps <= 57)).any(axis=1)
+    printable = (cps >= 33) & (cps <= 126)
+    alphanumeric = ((cps >= 97) & (cps <= 122)) | ((cps >= 65) & (cps <= 90)) | ((cps >= 48) & (cps <= 57))
+    symbols = (printable & ~alphanumeric).any(axis=1)
+    other = (cps > 126).any(axis=1)
+
+    pool = (lowercase * CLASS_POOL_SIZES['lowercase'] + uppercase * CLASS_POOL_SIZES['uppercase']
+            + digits * CLASS_POOL_SIZES['digits'] + symbols * CLASS_POOL_SIZES['symbols']
+            + other * CLASS_POOL_SIZES['other'])
+    classes = lowercase.astype(int) + uppercase + digits + symbols + other
+
+    lowered = np.char.lower(text)
+    lowered_names = np.char.lower(np.array(names, dtype=str))
+    lowered_usernames = np.char.lower(np.array(usernames, dtype=str))
+    similar = (contains(lowered, lowered_names) | contains(lowered_names, lowered)
+               | contains(lowered, lowered_usernames) | contains(lowered_usernames, lowered))
+    return classes, pool, similar
+
+
+def score_passwords(passwords, names=None, usernames=None):
+    """Score a list of passwords at once, returns a dict of per-password NumPy arrays."""
+    count = len(passwords)
+    names = names if names is not None else [''] * count
+    usernames = usernames if usernames is not None else [''] * count
+    if count == 0:
+        empty = np.zeros(0)
+        return {'length': empty.astype(int), 'entropy': empty, 'classes': empty.astype(int),
+                'cluster': empty.astype(int), 'reuse_count': empty.astype(int), 'similar': empty.astype(bool)}
+
+    length = np.fromiter((len(password) for password in passwords), dtype=int, count=count)
+    widths = np.maximum(MIN_WIDTH, 2 ** np.ceil(np.log2(np.maximum(length, 1)))).astype(int)
+    classes = np.zeros(count, dtype=int)
+    pool = np.zeros(count, dtype=int)
+    similar = np.zeros(count, dtype=bool)
+    for width in np.unique(widths):
+        bucket = np.flatnonzero(widths == width)
+        classes[bucket], pool[bucket], similar[bucket] = score_bucket(
+            [passwords[i] for i in bucket], [names[i] for i in bucket], [usernames[i] for i in bucket], width)
+    entropy = length * np.log2(np.maximum(pool, 1))
+
+    # Reuse clusters: equal passwords share a cluster id, compared in full
+    cluster_ids = {}
+    cluster = np.fromiter((cluster_ids.setdefault(password, len(cluster_ids)) for password in passwords),
+                          dtype=int, count=count)
+    reuse_count = np.bincount(cluster)
+
+    return {
+        'length': length,
+        'entropy': entropy,
+        'classes': classes,
+        'cluster': cluster,
+        'reuse_count': reuse_count[cluster],
+        'similar': similar,
+    }
+
+
+def strength_label(entropy):
+    for limit, label in STRENGTH_LEVELS:
+        if entropy < limit:
+            return label
+    return STRENGTH_LEVELS[-1][1]
+
+
+def audit_vault(user_id, decryption_service=None):
+    """Build the vault health report for one user."""
+    kinds, ids, labels, usernames, passwords = [], [], [], [], []
+    for kind, item_id, label, username, password in collect_vault_entries(user_id, decryption_service):
+        kinds.append(kind)
+        ids.append(item_id)
+        labels.append(label)
+        usernames.append(username)
+        passwords.append(password)
+
+    scores = score_passwords(passwords, labels, usernames)
+    entries = []
+    clusters = {}
+    for i in range(len(passwords)):
+        entropy = float(scores['entropy'][i])
+        reused = int(scores['reuse_count'][i]) > 1
+        entry = {
+            'kind': kinds[i],
+            'id': ids[i],
+            'label': labels[i],
+            'length': int(scores['length'][i]),
+            'entropy': round(entropy, 1),
+            'classes': int(scores['classes'][i]),
+            'strength': strength_label(entropy),
+            'reused': reused,
+            'similar_to_name': bool(scores['similar'][i]),
+        }
+        entries.append(entry)
+        if reused:
+            clusters.setdefault(int(scores['cluster'][i]), []).append(labels[i])
+
+    weak = [entry for entry in entries if entry['strength'] in ('very weak', 'weak')]
+    return {
+        'total': len(entries),
+        'weak_count': len(weak),
+        'reused_count': sum(entry['reused'] for entry in entries),
+        'similar_count': sum(entry['similar_to_name'] for entry in entries),
+        'average_entropy': round(float(scores['entropy'].mean()), 1) if entries else 0.0,
+        'reuse_clusters': list(clusters.values()),
+        'entries': entries,
+    }
@@ -0,0 +1,216 @@
+import base64
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from django.conf import settings
+
+from .decryption import DECRYPTION_ERROR, VaultDecryptionService
+from .vault_import import IMPORT_TYPES
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('jsonl', 'csv')
+EXPORT_VERSION = 1
+
+# Exported types in cursor order, the fields are the ones the importer reads back
+EXPORT_TYPES = [(kind, model, list(form_class._meta.fields)) for kind, (model, form_class) in IMPORT_TYPES.items()]
+EXPORT_COLUMNS = ['type', 'id'] + sorted({field for _, _, fields in EXPORT_TYPES for field in fields})
+
+
+def derive_cipher(passphrase, salt, iterations):
+    """Fernet cipher keyed from the export passphrase with PBKDF2-SHA256."""
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=iterations)
+    return Fernet(base64.urlsafe_b64encode(kdf.derive(passphrase.encode())))
+
+
+def parse_cursor(cursor):
+    """Turn a ``type:id`` cursor into ``(type position, id)``, or raise ValueError."""
+    if not cursor:
+        return None
+    kind, _, item_id = cursor.partition(':')
+    kinds = [kind for kind, _, _ in EXPORT_TYPES]
+    if kind not in kinds or not item_id.isdigit():
+        raise ValueError(f"Invalid export cursor: {cursor!r}")
+    return kinds.index(kind), int(item_id)
+
+
+class VaultExporter:
+    """Stream a user's vault as encrypted frames.
+
+    The output starts with one plaintext JSON header line (format, compression and
+    the key derivation salt), followed by frames: each frame is one chunk of rows
+    of a single type, serialized as JSON Lines or CSV, optionally gzipped, then
+    encrypted to a Fernet token and ended with a newline. Only one chunk is in
+    memory at a time. Rows are exported by type then id, so a ``type:id`` cursor
+    resumes an interrupted export right after that row.
+    """
+
+    def __init__(self, user_id, passphrase, fmt='jsonl', compress=False, chunk_size=None,
+                 salt=None, iterations=None, decryption_service=None):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        self.user_id = user_id
+        self.fmt = fmt
+        self.compress = compress
+        self.chunk_size = chunk_size or getattr(settings, 'VAULT_EXPORT_CHUNK_SIZE', 500)
+        self.salt = salt or os.urandom(16)
+        self.iterations = iterations or getattr(settings, 'VAULT_EXPORT_KDF_ITERATIONS', 480000)
+        self.cipher = derive_cipher(passphrase, self.salt, self.iterations)
+        self.decryption_service = decryption_service or VaultDecryptionService(batch_size=self.chunk_size)
+
+    def header(self):
+        return json.dumps({
+            'mypass_export': EXPORT_VERSION,
+            'format': self.fmt,
+            'gzip': self.compress,
+            'kdf': 'pbkdf2_sha256',
+            'iterations': self.iterations,
+            'salt': base64.b64encode(self.salt).decode(),
+        }).encode() + b'\n'
+
+    def stream(self, cursor=None, include_header=True, include_columns=None):
+        """Yield the export as bytes, starting after ``cursor`` when given.
+
+        ``include_columns`` defaults to ``include_header`` and only matters for CSV.
+        """
+        if include_header:
+            yield self.header()
+        if include_columns is None:
+            include_columns = include_header
+        if include_columns and self.fmt == 'csv':
+            # Column names go in their own frame so a resumed export can skip them
+            yield self.encrypt_frame(self.serialize([], with_header=True))
+        for records in self.iter_chunks(cursor):
+            if records:
+                yield self.encrypt_frame(self.serialize(records))
+
+    def iter_chunks(self, cursor=None):
+        """Yield lists of export records, at most ``chunk_size`` long and never mixing types."""
+        position = parse_cursor(cursor)
+        for index, (kind, model, fields) in enumerate(EXPORT_TYPES):
+            queryset = model.objects.filter(user_id=self.user_id).order_by('id')
+            if position is not None:
+                if index < position[0]:
+                    continue
+                if index == position[0]:
+                    queryset = queryset.filter(id__gt=position[1])
+
+            chunk = []
+            for item in queryset.iterator(chunk_size=self.chunk_size):
+                chunk.append(item)
+                if len(chunk) >= self.chunk_size:
+                    yield self.to_records(kind, fields, chunk)
+                    chunk = []
+            if chunk:
+                yield self.to_records(kind, fields, chunk)
+
+    def to_records(self, kind, fields, items):
+        passwords = {}
+        if kind == 'account':
+            # Saved passwords are decrypted so the export can be imported with another key
+            for entry in self.decryption_service.decrypt_batch(items):
+                passwords[entry['account'].id] = entry['decrypted_password']
+
+        records = []
+        for item in items:
+            record = {'type': kind, 'id': item.id}
+            for field in fields:
+                value = getattr(item, field)
+                record[field] = value.isoformat() if hasattr(value, 'isoformat') else value
+            if kind == 'account':
+                if passwords[item.id] == DECRYPTION_ERROR:
+                    logger.warning(f"Skipping saved password {item.id} in export, it could not be decrypted")
+                    continue
+                record['password'] = passwords[item.id]
+            records.append(record)
+        return records
+
+    def serialize(self, records, with_header=False):
+        if self.fmt == 'jsonl':
+            return ''.join(json.dumps(record) + '\n' for record in records).encode()
+        buffer = io.StringIO(newline='')
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, restval='')
+        if with_header:
+            writer.writeheader()
+        writer.writerows(records)
+        return buffer.getvalue().encode()
+
+    def encrypt_frame(self, payload):
+        if self.compress:
+            payload = gzip.compress(payload)
+        return self.cipher.encrypt(payload) + b'\n'
+
+
+def read_export_header(line):
+    header = json.loads(line)
+    if header.get('mypass_export') != EXPORT_VERSION:
+        raise ValueError("Not a MyPass export file.")
+    return header
+
+
+def open_export(stream, passphrase):
+    """Return ``(format, lines)`` for an encrypted export read from a binary stream.
+
+    The lines are decrypted one frame at a time and can be passed straight to
+    ``vault_import.parse_records``.
+    """
+    header = read_export_header(stream.readline())
+    cipher = derive_cipher(passphrase, base64.b64decode(header['salt']), header['iterations'])
+
+    def lines():
+        for frame in stream:
+            frame = frame.strip()
+            if not frame:
+                continue
+            payload = cipher.decrypt(frame)
+            if header['gzip']:
+                payload = gzip.decompress(payload)
+            yield from io.StringIO(payload.decode(), newline='')
+
+    return header['format'], lines()
+
+
+def resume_point(stream, passphrase):
+    """Find where an interrupted export written to a seekable binary stream left off.
+
+    Returns ``(header, cursor, offset, has_columns)``: the export header, the cursor
+    of the last complete frame (None when no rows were written), the byte offset
+    right after that frame, past which any partially written frame should be
+    truncated, and whether the CSV column name frame made it to disk (always True
+    for JSON Lines, which has none).
+    """
+    header_line = stream.readline()
+    header = read_export_header(header_line)
+    cipher = derive_cipher(passphrase, base64.b64decode(header['salt']), header['iterations'])
+
+    last_frame, offset = None, len(header_line)
+    for frame in stream:
+        if not frame.endswith(b'\n'):
+            break
+        last_frame = frame
+        offset += len(frame)
+
+    cursor = None
+    if last_frame is not None:
+        payload = cipher.decrypt(last_frame.strip())
+        if header['gzip']:
+            payload = gzip.decompress(payload)
+        text = payload.decode()
+        if header['format'] == 'jsonl':
+            last = json.loads(text.splitlines()[-1]) if text else None
+            cursor = f"{last['type']}:{last['id']}" if last else None
+        else:
+            # The column name frame has no rows to resume from
+            rows = list(csv.reader(io.StringIO(text, newline='')))
+            if rows and rows[-1][:2] != EXPORT_COLUMNS[:2]:
+                cursor = f"{rows[-1][0]}:{rows[-1][1]}"
+    # The column name frame is always the first one, any complete frame means it was written
+    has_columns = header['format'] != 'csv' or last_frame is not None
+    return header, cursor, offset, has_columns
@@ -0,0 +1,257 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import json
+import logging
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .crypto import blind_index, get_cipher
+from .fields import encrypt_fields
+from .forms import AccountForm, CreditCardForm, IdentityForm, LoginForm, SecureNoteForm
+from .models import Account, CreditCard, ExpiryEventsMixin, Identity, Login, Notification, SecureNote
+from .observer_registry import ObserverRegistry
+from .search import SEARCH_MODEL_KINDS, index_items
+from .signals import notify_expiry
+from .vault_summary import invalidate_vault_summary
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'json', 'jsonl')
+
+# Record type -> (model, form validating the row)
+IMPORT_TYPES = {
+    'login': (Login, LoginForm),
+    'credit_card': (CreditCard, CreditCardForm),
+    'identity': (Identity, IdentityForm),
+    'secure_note': (SecureNote, SecureNoteForm),
+    'account': (Account, AccountForm),
+}
+
+# Column names used by the CSV exports of other password managers, mapped onto Login fields
+LOGIN_ALIASES = {
+    'name': 'site_name',
+    'title': 'site_name',
+    'url': 'site_url',
+    'login_uri': 'site_url',
+    'login_username': 'username',
+    'login_password': 'password',
+    'note': 'notes',
+    'extra': 'notes',
+}
+
+
+class ImportResult:
+    """Counts, per-row errors and throughput of one import run."""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = Counter()
+        self.errors = []  # (row number, message)
+        self.batches = 0
+        self.elapsed = 0.0
+
+    @property
+    def created_total(self):
+        return sum(self.created.values())
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in IMPORT_FORMATS else 'csv'
+
+
+def parse_records(stream, fmt):
+    """Yield ``(row number, record, error)`` from a text stream.
+
+    CSV and JSON Lines are read one row at a time. A plain JSON file is a single
+    document, it is loaded whole and must hold a list of records (or an ``items`` list).
+    """
+    if fmt == 'csv':
+        # Row 1 is the header
+        for number, row in enumerate(csv.DictReader(stream), start=2):
+            yield number, row, None
+    elif fmt == 'jsonl':
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line), None
+            except ValueError as e:
+                yield number, None, f"Invalid JSON: {e}"
+    elif fmt == 'json':
+        try:
+            document = json.load(stream)
+        except ValueError as e:
+            yield 1, None, f"Invalid JSON: {e}"
+            return
+        records = document.get('items', []) if isinstance(document, dict) else document
+        for number, record in enumerate(records, start=1):
+            yield number, record, None
+    else:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+
+class VaultImporter:
+    """Import vault records for one user in fixed-size batches.
+
+    Every row is validated with the same ModelForm as the create views. Secrets
+    are encrypted on a thread pool, each batch is written with ``bulk_create``
+    inside its own transaction, and observers get one ``vault_imported`` event per
+    committed batch. A bad row is recorded in the result and skipped.
+    """
+
+    def __init__(self, user, batch_size=None, max_workers=None, cipher=None, default_type=None):
+        self.user = user
+        self.batch_size = batch_size or getattr(settings, 'VAULT_IMPORT_BATCH_SIZE', 500)
+        self.max_workers = max_workers or getattr(settings, 'VAULT_IMPORT_WORKERS', 4)
+        self.cipher = cipher or get_cipher()
+        self.default_type = default_type
+
+    def run(self, records, progress=None):
+        """Import ``(row number, record, error)`` tuples, see parse_records."""
+        result = ImportResult()
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            batch = []
+            for number, record, error in records:
+                result.rows += 1
+                if error:
+                    result.errors.append((number, error))
+                    continue
+                batch.append((number, record))
+                if len(batch) >= self.batch_size:
+                    self._import_batch(batch, result, executor)
+                    batch = []
+                    if progress:
+                        progress(result, time.monotonic() - started)
+            if batch:
+                self._import_batch(batch, result, executor)
+        result.elapsed = time.monotonic() - started
+        return result
+
+    def build_instance(self, record):
+        """Validate one record and return an unsaved model instance, or raise ValueError."""
+        if not isinstance(record, dict):
+            raise ValueError("Record is not an object.")
+        kind = record.get('type') or self.default_type
+        if kind not in IMPORT_TYPES:
+            raise ValueError(f"Unknown record type: {kind!r}")
+        model, form_class = IMPORT_TYPES[kind]
+
+        data = {key: value for key, value in record.items() if key != 'type' and value is not None}
+        if kind == 'login':
+            for alias, field in LOGIN_ALIASES.items():
+                if alias in data and field not in data:
+                    data[field] = data.pop(alias)
+
+        form = form_class(data)
+        if not form.is_valid():
+            raise ValueError('; '.join(
+                f"{field}: {' '.join(errors)}" for field, errors in form.errors.items()
+            ))
+        instance = form.save(commit=False)
+        instance.user = self.user
+        if isinstance(instance, ExpiryEventsMixin):
+            # bulk_create skips save(), the expiry flags are set here so they are
+            # inserted with the row and the events are emitted after the batch
+            instance.prepare_expiry_events()
+        return instance
+
+    def _secure(self, instance):
+        # Runs on the thread pool: the Fernet encryption and HMAC blind index of a row
+        if isinstance(instance, Account):
+            instance.password_index = blind_index(instance.password)
+            instance.password = self.cipher.encrypt(instance.password.encode()).decode()
+        elif isinstance(instance, Login):
+            instance.password_index = blind_index(instance.password)
+        # Encrypted fields get their tokens here too, bulk_create writes them unchanged
+        return encrypt_fields(instance, self.cipher)
+
+    def _import_batch(self, batch, result, executor):
+        instances = []
+        numbers = []
+        for number, record in batch:
+            try:
+                instances.append(self.build_instance(record))
+                numbers.append(number)
+            except ValueError as e:
+                result.errors.append((number, str(e)))
+        if not instances:
+            return
+
+        by_model = {}
+        for instance in executor.map(self._secure, instances):
+            by_model.setdefault(type(instance), []).append(instance)
+
+        result.batches += 1
+        counts = {model._meta.model_name: len(rows) for model, rows in by_model.items()}
+        try:
+            with transaction.atomic():
+                for model, rows in by_model.items():
+                    model.objects.bulk_create(rows)
+                    if model in SEARCH_MODEL_KINDS:
+                        index_items(SEARCH_MODEL_KINDS[model], rows)
+                    if issubclass(model, ExpiryEventsMixin):
+                        for instance in rows:
+                            if instance.expiry_events:
+                                instance.emit_expiry_events()
+                                notify_expiry(instance)
+                # bulk_create skips save() and the per-row signals: the search rows and
+                # expiry notices are written above, observers get one aggregated event
+                # and the cached summary is rebuilt on the next read
+                ObserverRegistry.notify_on_commit(
+                    event="vault_imported",
+                    data={"user_id": self.user.id, "batch": result.batches, "counts": counts},
+                    key=(self.user.id, result.batches),
+                )
+                transaction.on_commit(lambda: invalidate_vault_summary(self.user.id))
+        except DatabaseError as e:
+            logger.error(f"Vault import batch {result.batches} failed: {e}")
+            result.errors.extend((number, f"Batch not saved: {e}") for number in numbers)
+            return
+        result.created.update(counts)
+
+
+# Large uploads are imported here, one at a time, instead of on the request thread
+import_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vault-import')
+
+
+def run_import_job(user_id, path, fmt, default_type=None, name=None):
+    """Import a saved upload, then tell the user the outcome with a notification.
+
+    Runs on import_executor. The file is removed when done.
+    """
+    try:
+        user = User.objects.get(id=user_id)
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            result = VaultImporter(user, default_type=default_type).run(parse_records(stream, fmt))
+        message = (f"Import of {name or 'your file'} finished at {timezone.now():%Y-%m-%d %H:%M}: "
+                   f"{result.created_total} items imported, {len(result.errors)} rows skipped.")
+        Notification.create_once(user_id, message)
+        return result
+    except Exception as e:
+        logger.error(f"Background vault import for user {user_id} failed: {e}")
+        Notification.create_once(user_id, f"Import of {name or 'your file'} failed: {e}")
+    finally:
+        os.unlink(path)
+        # Worker threads keep their own connection, do not leave it open
+        connection.close()
+
+
+def start_import_job(user, upload, fmt, default_type=None):
+    """Copy an upload to a temporary file and queue its import, returns the future."""
+    with tempfile.NamedTemporaryFile('wb', suffix=f'.{fmt}', delete=False) as handle:
+        for chunk in upload.chunks():
+            handle.write(chunk)
+    return import_executor.submit(run_import_job, user.id, handle.name, fmt, default_type, upload.name)
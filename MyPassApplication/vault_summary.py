@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import Account, CreditCard, Identity, Login, Notification, SecureNote
+
+# Summary field kept in sync for each counted vault model
+COUNT_FIELDS = {
+    Login: 'logins',
+    CreditCard: 'credit_cards',
+    Identity: 'identities',
+    SecureNote: 'secure_notes',
+    Account: 'passwords',
+}
+
+
+def summary_key(user_id):
+    return f'vault_summary:{user_id}'
+
+
+def get_vault_summary(user_id):
+    """Return the user's vault summary, one cache read when it is warm."""
+    summary = cache.get(summary_key(user_id))
+    if summary is None:
+        summary = build_vault_summary(user_id)
+        cache.set(summary_key(user_id), summary, settings.VAULT_SUMMARY_TIMEOUT)
+    return summary
+
+
+def build_vault_summary(user_id):
+    """Compute the summary from the database (cache miss path)."""
+    today = timezone.now().date()
+    summary = {field: model.objects.filter(user_id=user_id).count() for model, field in COUNT_FIELDS.items()}
+
+    upcoming = [
+        CreditCard.objects.filter(user_id=user_id, expiration_date__gte=today).aggregate(
+            date=Min('expiration_date'))['date'],
+        Identity.objects.filter(user_id=user_id, passport_expiration_date__gte=today).aggregate(
+            date=Min('passport_expiration_date'))['date'],
+        Identity.objects.filter(user_id=user_id, license_expiration_date__gte=today).aggregate(
+            date=Min('license_expiration_date'))['date'],
+    ]
+    upcoming = [expiry for expiry in upcoming if expiry is not None]
+    summary['next_expiry'] = min(upcoming) if upcoming else None
+    summary['unread_notifications'] = Notification.objects.filter(user_id=user_id, is_read=False).count()
+    return summary
+
+
+def invalidate_vault_summary(user_id):
+    cache.delete(summary_key(user_id))
+
+
+def invalidate_vault_summary_on_commit(user_id):
+    # The summary is rebuilt on the next read instead of being patched in place:
+    # a read-modify-write of the cached dict loses concurrent updates, and other
+    # processes (LocMemCache is per process) would never see the patch. Deleting
+    # after the commit keeps a read inside the transaction from caching old rows.
+    transaction.on_commit(lambda: invalidate_vault_summary(user_id))
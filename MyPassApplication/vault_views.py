@@ -4,22 +4,38 @@ from django.views.generic import View, ListView, CreateView, DetailView, UpdateV
 from django.contrib import messages
 from django.utils.decorators import method_decorator
 from django.http import Http404
+from django.db.models import Case, CharField, Value, When
 from .models import Login, CreditCard, Identity, SecureNote, SessionManager
 from .forms import LoginForm, CreditCardForm, IdentityForm, SecureNoteForm
 from .views import session_login_required 
 from .views import mediator
+from .pagination import KeysetPaginationMixin
 from django.apps import apps
 import pyperclip
 from datetime import date, timedelta
 
 
 
+EXPIRY_EXPIRED = 'expired'
+EXPIRY_EXPIRING = 'expiring'
+EXPIRY_OK = 'ok'
+
+
+def expiry_status(field, today, upcoming_date):
+    # SQL expression classifying a date field as expired / expiring / ok
+    return Case(
+        When(**{f'{field}__lt': today}, then=Value(EXPIRY_EXPIRED)),
+        When(**{f'{field}__lte': upcoming_date}, then=Value(EXPIRY_EXPIRING)),
+        default=Value(EXPIRY_OK),
+        output_field=CharField(),
+    )
+
+
 class BaseVaultView(View):
     session_manager = None
 
     def dispatch(self, request, *args, **kwargs):
-        self.session_manager = SessionManager()
-        self.session_manager.set_request(request)
+        self.session_manager = SessionManager.for_request(request)
         if not self.session_manager.is_authenticated():
             return redirect('login')
         if self.session_manager.has_timed_out():
@@ -50,7 +66,7 @@ class VaultHomeView(BaseVaultView, View):
 
 # Views for Login Data Type
 @method_decorator(session_login_required, name='dispatch')
-class LoginListView(BaseVaultView, ListView):
+class LoginListView(BaseVaultView, KeysetPaginationMixin, ListView):
     model = Login
     template_name = 'login_list.html'
     context_object_name = 'logins'
@@ -120,7 +136,7 @@ class LoginDeleteView(BaseVaultView, UserObjectMixin, DeleteView):
 
 # Views for CreditCard Data Type
 @method_decorator(session_login_required, name='dispatch')
-class CreditCardListView(BaseVaultView, ListView):
+class CreditCardListView(BaseVaultView, KeysetPaginationMixin, ListView):
     model = CreditCard
     template_name = 'creditcard_list.html'
     context_object_name = 'creditcards'
@@ -170,7 +186,7 @@ class CreditCardDeleteView(BaseVaultView, UserObjectMixin, DeleteView):
 
 
 @method_decorator(session_login_required, name='dispatch')
-class IdentityListView(BaseVaultView, ListView):
+class IdentityListView(BaseVaultView, KeysetPaginationMixin, ListView):
     model = Identity
     template_name = 'identity_list.html'
     context_object_name = 'identities'
@@ -182,86 +198,55 @@ class IdentityListView(BaseVaultView, ListView):
         today = date.today()
         upcoming_date = today + timedelta(days=30)  # Adjust the number of days as needed
 
-        # Identify expired passports
-        expired_passport_identities = identities.filter(
-            passport_expiration_date__lt=today
-        )
-
-        # Identify passports expiring soon
-        expiring_passport_identities = identities.filter(
-            passport_expiration_date__gte=today,
-            passport_expiration_date__lte=upcoming_date
-        )
-
-        # Identify expired licenses
-        expired_license_identities = identities.filter(
-            license_expiration_date__lt=today
-        )
-
-        # Identify licenses expiring soon
-        expiring_license_identities = identities.filter(
-            license_expiration_date__gte=today,
-            license_expiration_date__lte=upcoming_date
-        )
-
-        # Combine the expired identities
-        expired_identities = expired_passport_identities.union(expired_license_identities)
-
-        # Combine the expiring identities
-        expiring_identities = expiring_passport_identities.union(expiring_license_identities)
-
-        # Notify mediator about expired items
-        for identity in expired_identities:
-            mediator.notify(
-                sender="IdentityListView",
-                event="identity_expired",
-                data={
-                    "user_id": identity.user.id,
-                    "full_name": identity.full_name,
-                    "passport_expiration_date": identity.passport_expiration_date,
-                    "license_expiration_date": identity.license_expiration_date,
-                },
-            )
-
-        # Notify mediator about expiring soon items
-        for identity in expiring_identities:
-            mediator.notify(
-                sender="IdentityListView",
-                event="identity_expiring_soon",
-                data={
-                    "user_id": identity.user.id,
-                    "full_name": identity.full_name,
-                    "passport_expiration_date": identity.passport_expiration_date,
-                    "license_expiration_date": identity.license_expiration_date,
-                },
-            )
-
-        # Add warning messages for expired items
-        for expired_identity in expired_identities:
-            if expired_identity.passport_expiration_date and expired_identity.passport_expiration_date < today:
-                messages.warning(
-                    self.request,
-                    f"The passport for {expired_identity.full_name} has expired on {expired_identity.passport_expiration_date}. Please update it.",
+        # One query: annotate each identity with its passport and license status and
+        # only fetch the ones that need attention
+        alerts = identities.annotate(
+            passport_status=expiry_status('passport_expiration_date', today, upcoming_date),
+            license_status=expiry_status('license_expiration_date', today, upcoming_date),
+        ).exclude(
+            passport_status=EXPIRY_OK, license_status=EXPIRY_OK
+        ).only(
+            'id', 'user_id', 'full_name', 'passport_expiration_date', 'license_expiration_date'
+        ).order_by('id')
+
+        expired_warnings = []
+        expiring_warnings = []
+        for identity in alerts:
+            statuses = (identity.passport_status, identity.license_status)
+            data = {
+                "user_id": identity.user_id,
+                "full_name": identity.full_name,
+                "passport_expiration_date": identity.passport_expiration_date,
+                "license_expiration_date": identity.license_expiration_date,
+            }
+
+            # Notify mediator about expired and expiring soon items
+            if EXPIRY_EXPIRED in statuses:
+                mediator.notify(sender="IdentityListView", event="identity_expired", data=data)
+            if EXPIRY_EXPIRING in statuses:
+                mediator.notify(sender="IdentityListView", event="identity_expiring_soon", data=data)
+
+            if identity.passport_status == EXPIRY_EXPIRED:
+                expired_warnings.append(
+                    f"The passport for {identity.full_name} has expired on {identity.passport_expiration_date}. Please update it."
                 )
-            if expired_identity.license_expiration_date and expired_identity.license_expiration_date < today:
-                messages.warning(
-                    self.request,
-                    f"The license for {expired_identity.full_name} has expired on {expired_identity.license_expiration_date}. Please update it.",
+            if identity.license_status == EXPIRY_EXPIRED:
+                expired_warnings.append(
+                    f"The license for {identity.full_name} has expired on {identity.license_expiration_date}. Please update it."
                 )
-
-        # Add warning messages for expiring soon items
-        for expiring_identity in expiring_identities:
-            if expiring_identity.passport_expiration_date and today <= expiring_identity.passport_expiration_date <= upcoming_date:
-                messages.warning(
-                    self.request,
-                    f"The passport for {expiring_identity.full_name} will expire on {expiring_identity.passport_expiration_date}. Please renew it soon.",
+            if identity.passport_status == EXPIRY_EXPIRING:
+                expiring_warnings.append(
+                    f"The passport for {identity.full_name} will expire on {identity.passport_expiration_date}. Please renew it soon."
                 )
-            if expiring_identity.license_expiration_date and today <= expiring_identity.license_expiration_date <= upcoming_date:
-                messages.warning(
-                    self.request,
-                    f"The license for {expiring_identity.full_name} will expire on {expiring_identity.license_expiration_date}. Please renew it soon.",
+            if identity.license_status == EXPIRY_EXPIRING:
+                expiring_warnings.append(
+                    f"The license for {identity.full_name} will expire on {identity.license_expiration_date}. Please renew it soon."
                 )
 
+        # Add warning messages, expired items first
+        for warning in expired_warnings + expiring_warnings:
+            messages.warning(self.request, warning)
+
         return identities
 
 
@@ -327,7 +312,7 @@ class IdentityDeleteView(BaseVaultView, UserObjectMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 # Views for SecureNote Data Type
 @method_decorator(session_login_required, name='dispatch')
-class SecureNoteListView(BaseVaultView, ListView):
+class SecureNoteListView(BaseVaultView, KeysetPaginationMixin, ListView):
     model = SecureNote
     template_name = 'securenote_list.html'
     context_object_name = 'securenotes'
@@ -1,5 +1,5 @@
 from django.shortcuts import get_object_or_404, render, redirect
-from .forms import CustomUserCreationForm, SecurityQuestionForm, UsernameForm
+from .forms import CustomUserCreationForm, SecurityQuestionForm, UsernameForm, VaultExportForm, VaultImportForm
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login
 from django.contrib import messages
@@ -7,15 +7,29 @@ from django.contrib.auth.models import User
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.forms import PasswordChangeForm
-from .models import Account, Notification, Password, SessionManager
-from django.http import HttpResponseRedirect
+from .models import Account, Login, Notification, Password, SessionManager
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
 from functools import wraps
+import json
 from .handlers import Question1Handler, Question2Handler, Question3Handler
-from .password_builder import PasswordDirector, SimplePasswordBuilder, ComplexPasswordBuilder, PasswordBuilder
-from cryptography.fernet import Fernet
+from .password_builder import PasswordDirector, PASSWORD_POLICIES
 from django.conf import settings
+from django.db import transaction
 from .mediators import UIMediator
 from .components import SavedPasswords, Dashboard
+from .decryption import VaultDecryptionService
+from .crypto import blind_index, get_cipher
+from .pagination import keyset_paginate
+from .vault_summary import get_vault_summary, invalidate_vault_summary, invalidate_vault_summary_on_commit
+from .vault_audit import audit_vault
+from django.core.cache import cache
+import io
+from .vault_import import VaultImporter, detect_format, parse_records, start_import_job
+from .vault_export import VaultExporter, parse_cursor
+from .search import search_vault
+from django.urls import reverse
+import time
 
 # Initialize mediator
 mediator = UIMediator()
@@ -28,16 +42,18 @@ mediator.register("Dashboard", dashboard_component)
 
 
 
-# Access the encryption key from settings
-cipher_suite = Fernet(settings.ENCRYPTION_KEY)
+# Shared cipher for ENCRYPTION_KEY
+cipher_suite = get_cipher()
+
+# Batched decryption of saved passwords, shares the cipher above
+decryption_service = VaultDecryptionService(cipher=cipher_suite)
 
 def session_login_required(view_func): # this customer decorator will check to see if the user is 
                                        # authenticated with session manager before giving them access to pages
                                        # help from: https://www.geeksforgeeks.org/creating-custom-decorator-in-django-for-different-permissions/
     @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
-        session_manager = SessionManager()
-        session_manager.set_request(request)
+        session_manager = SessionManager.for_request(request)
         if not session_manager.is_authenticated():
             return HttpResponseRedirect('/login/') 
         return view_func(request, *args, **kwargs)
@@ -46,8 +62,7 @@ def session_login_required(view_func): # this customer decorator will check to s
 
 
 def account(request):
-    session_manager = SessionManager()
-    session_manager.set_request(request)
+    session_manager = SessionManager.for_request(request)
 
     if session_manager.has_timed_out():
         session_manager.logout()
@@ -69,8 +84,7 @@ def account(request):
 
 
 def login_view(request):
-    session_manager = SessionManager()
-    session_manager.set_request(request)
+    session_manager = SessionManager.for_request(request)
 
     if request.method == 'POST':
         username = request.POST['username']
@@ -91,8 +105,7 @@ def login_view(request):
 # Vault view (function-based)
 @session_login_required
 def vault(request):
-    session_manager = SessionManager()
-    session_manager.set_request(request)
+    session_manager = SessionManager.for_request(request)
 
     if session_manager.has_timed_out():
         session_manager.logout()
@@ -102,33 +115,67 @@ def vault(request):
     session_manager.update_last_activity()
     user = session_manager.get_current_user()
 
-    notifications = Notification.objects.filter(user=user, is_read=False)
-    for notification in notifications:
-        notification.is_read = True
-        notification.save()
+    # Materialize the unread notifications before marking them read, so the page
+    # still shows them, then acknowledge them all with one UPDATE
+    notifications = list(Notification.objects.filter(user=user, is_read=False).order_by('-timestamp'))
+    if notifications:
+        Notification.mark_read(user, ids=[notification.id for notification in notifications])
+        # The UPDATE is already committed (autocommit), drop the summary right away
+        invalidate_vault_summary(user.id)
 
-    # Retrieve all saved passwords for the current user sorted b y django built in ordering
-    saved_passwords = Account.objects.filter(user=user).order_by('-id')    
+    # Counts and next expiry, a single cache read when warm. Read after the
+    # notifications above are marked, so the unread count is current.
+    summary = get_vault_summary(user.id)
 
-    return render(request, 'vault_home.html', {'notifications': notifications, 'saved_passwords': saved_passwords})
+    # The saved passwords are listed (and paged) by the saved_passwords view
+    return render(request, 'vault_home.html', {
+        'notifications': notifications,
+        'summary': summary,
+    })
 
 
 # Mark notification as read
 @session_login_required
 def mark_notification_read(request, notification_id):
-    session_manager = SessionManager()
-    session_manager.set_request(request)
+    session_manager = SessionManager.for_request(request)
     user = session_manager.get_current_user()
     notification = get_object_or_404(Notification, id=notification_id, user=user)
     notification.is_read = True
-    notification.save()
-    return redirect('vault')
+    notification.save(update_fields=['is_read'])
+    return redirect('vault_home')
+
+
+# Mark a batch of notifications (or all of them) as read in one round trip
+@session_login_required
+@require_POST
+def mark_notifications_read(request):
+    session_manager = SessionManager.for_request(request)
+    user = session_manager.get_current_user()
+
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:  # also covers a body that is not UTF-8
+        return JsonResponse({'error': 'Invalid JSON body.'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Expected a JSON object.'}, status=400)
+
+    if payload.get('all'):
+        updated = Notification.mark_read(user)
+    else:
+        ids = payload.get('ids')
+        # bool is an int subclass, true/false are not ids
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return JsonResponse({'error': "Expected a list of notification ids in 'ids'."}, status=400)
+        updated = Notification.mark_read(user, ids=ids)
+    if updated:
+        invalidate_vault_summary_on_commit(user.id)
+
+    return JsonResponse({'updated': updated})
 
 
 @session_login_required
 def create_password(request):
-    session_manager = SessionManager()
-    session_manager.set_request(request)
+    session_manager = SessionManager.for_request(request)
 
     # Check for session timeout
     if session_manager.has_timed_out():
@@ -153,16 +200,13 @@ def create_password(request):
             password = custom_password
             messages.success(request, "Your custom password has been saved.")
         else:
-            # Validate complexity and create password using the builder pattern
-            if complexity == 'simple':
-                builder = SimplePasswordBuilder()
-            elif complexity == 'complex':
-                builder = ComplexPasswordBuilder()
-            else:
+            # Validate complexity and create password from the named policy, the
+            # director and its compiled policy are shared across requests
+            if complexity not in PASSWORD_POLICIES:
                 messages.error(request, 'Invalid password complexity selection.')
                 return render(request, 'create_password.html', {'account_name': account_name})
-            
-            director = PasswordDirector(builder)
+
+            director = PasswordDirector.for_policy(complexity)
             password = director.create_password()
 
         # Encrypt the password before saving
@@ -172,35 +216,36 @@ def create_password(request):
             messages.error(request, f"Error encrypting password: {e}")
             return render(request, 'create_password.html', {'account_name': account_name})
 
-        # Check if the encrypted password already exists in the database
+        # Check if the password already exists in the vault, the blind index is
+        # deterministic so this is one indexed lookup instead of decrypting every row
+        password_index = blind_index(password)
         existing_password = Account.objects.filter(
             user=session_manager.get_current_user(),
-            password=encrypted_password
-        ).first()
+            password_index=password_index
+        ).exists()
 
         if existing_password:
             messages.error(request, "This password already exists in your vault!")
             return render(request, 'create_password.html', {'password': password, 'account_name': account_name})
 
+        if Login.objects.filter(user=session_manager.get_current_user(), password_index=password_index).exists():
+            messages.warning(request, "This password is already used by one of your saved logins.")
+
         # Save the password if "save_to_vault" checkbox is checked
         save_to_vault = request.POST.get('save_to_vault')
         if save_to_vault == 'yes':  # Only save if checkbox is checked
             try:
-                new_account = Account.objects.create(
-                    user=session_manager.get_current_user(),
-                    name=account_name,
-                    password=encrypted_password
-                )
-                new_account.suggested = True
-                new_account.save()
+                # A single INSERT, Account.save emits "password_created" once the
+                # transaction commits
+                with transaction.atomic():
+                    new_account = Account.objects.create(
+                        user=session_manager.get_current_user(),
+                        name=account_name,
+                        password=encrypted_password,
+                        password_index=password_index,
+                        suggested=True
+                    )
                 messages.success(request, "Password has been saved to the Vault!")
-
-                # Notify the mediator about password creation
-                mediator.notify(
-                    sender="create_password",
-                    event="password_created",
-                    data={"id": new_account.id, "account_name": account_name, "password": password},
-                )
             except Exception as e:
                 messages.error(request, f"Error saving password: {e}")
                 return render(request, 'create_password.html', {'password': password, 'account_name': account_name})
@@ -216,31 +261,169 @@ def create_password(request):
 
 @session_login_required
 def saved_passwords(request):
-    session_manager = SessionManager()
-    session_manager.set_request(request)
+    session_manager = SessionManager.for_request(request)
 
-    saved_passwords = Account.objects.filter(user=session_manager.get_current_user())
-    decrypted_passwords = []
+    # Only the requested page is fetched and decrypted, so the cost of rendering
+    # stays flat no matter how many passwords are in the vault
+    accounts = Account.objects.filter(user=session_manager.get_current_user())
+    page = keyset_paginate(accounts, after=request.GET.get('after'), before=request.GET.get('before'))
+    decrypted_passwords = decryption_service.decrypt_batch(page.object_list)
+
+    return render(request, 'saved_passwords.html', {'saved_passwords': decrypted_passwords, 'page_obj': page})
+
+
+@session_login_required
+def saved_passwords_json(request):
+    session_manager = SessionManager.for_request(request)
+
+    accounts = Account.objects.filter(user=session_manager.get_current_user())
+    page = keyset_paginate(accounts, after=request.GET.get('after'), before=request.GET.get('before'))
+    entries = decryption_service.decrypt_batch(page.object_list)
+
+    return JsonResponse({
+        'results': [
+            {
+                'id': entry['account'].id,
+                'name': entry['account'].name,
+                'suggested': entry['account'].suggested,
+                'password': entry['decrypted_password'],
+            }
+            for entry in entries
+        ],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+
+
+@session_login_required
+def vault_health(request):
+    session_manager = SessionManager.for_request(request)
+    if session_manager.has_timed_out():
+        session_manager.logout()
+        messages.warning(request, "Your account has been locked due to inactivity.")
+        return redirect('login')
+    session_manager.update_last_activity()
+    user = session_manager.get_current_user()
+
+    # The audit decrypts the whole vault, so the report is cached per user for a while
+    cache_key = f'vault_health:{user.id}'
+    report = cache.get(cache_key)
+    if report is None or request.GET.get('refresh'):
+        report = audit_vault(user.id, decryption_service)
+        cache.set(cache_key, report, settings.VAULT_HEALTH_TIMEOUT)
+
+    flagged = [
+        entry for entry in report['entries']
+        if entry['strength'] in ('very weak', 'weak') or entry['reused'] or entry['similar_to_name']
+    ]
+    return render(request, 'vault_health.html', {'report': report, 'flagged': flagged})
+
+
+
+@session_login_required
+def import_vault(request):
+    session_manager = SessionManager.for_request(request)
+    if session_manager.has_timed_out():
+        session_manager.logout()
+        messages.warning(request, "Your account has been locked due to inactivity.")
+        return redirect('login')
+    session_manager.update_last_activity()
+    user = session_manager.get_current_user()
+
+    result = None
+    if request.method == 'POST':
+        form = VaultImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            fmt = form.cleaned_data['format'] or detect_format(upload.name)
+            default_type = form.cleaned_data['default_type'] or None
+            if upload.size > settings.VAULT_IMPORT_INLINE_BYTES:
+                # Large files are imported by a background worker, the outcome
+                # arrives as a notification
+                start_import_job(user, upload, fmt, default_type)
+                messages.info(request, f"Importing {upload.name} in the background, "
+                                       "you will get a notification when it is done.")
+                return redirect('vault_home')
+            # The upload is parsed lazily, rows are validated and written batch by batch
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            importer = VaultImporter(user, cipher=cipher_suite, default_type=default_type)
+            result = importer.run(parse_records(stream, fmt))
+            if result.created_total:
+                messages.success(request, f"Imported {result.created_total} items.")
+            if result.errors:
+                messages.warning(request, f"{len(result.errors)} rows could not be imported.")
+    else:
+        form = VaultImportForm()
+
+    # A Counter would answer the template's created.items lookup with 0, hand over a list
+    created = sorted(result.created.items()) if result else []
+    return render(request, 'vault_import.html', {'form': form, 'result': result, 'created': created})
 
-    for account in saved_passwords:
-        try:
-            # Decrypt the password stored in the 'password' field
-            decrypted_password = cipher_suite.decrypt(account.password.encode()).decode()
-            decrypted_passwords.append({
-                'account': account,
-                'decrypted_password': decrypted_password
-            })
-        except Exception as e:
-            # Log the error for debugging
-            print(f"Error decrypting password for account {account.name}: {e}")
-            decrypted_passwords.append({
-                'account': account,
-                'decrypted_password': "Error decrypting password"
-            })
 
-    return render(request, 'saved_passwords.html', {'saved_passwords': decrypted_passwords})
+@session_login_required
+def export_vault(request):
+    session_manager = SessionManager.for_request(request)
+    if session_manager.has_timed_out():
+        session_manager.logout()
+        messages.warning(request, "Your account has been locked due to inactivity.")
+        return redirect('login')
+    session_manager.update_last_activity()
+    user = session_manager.get_current_user()
+
+    if request.method == 'POST':
+        form = VaultExportForm(request.POST)
+        if form.is_valid():
+            cursor = form.cleaned_data['cursor'] or None
+            try:
+                parse_cursor(cursor)
+            except ValueError as e:
+                form.add_error('cursor', str(e))
+            else:
+                exporter = VaultExporter(
+                    user.id,
+                    form.cleaned_data['passphrase'],
+                    fmt=form.cleaned_data['format'],
+                    compress=form.cleaned_data['gzip'],
+                    decryption_service=decryption_service,
+                )
+                # Frames are encrypted and sent as the rows are read, the vault is never
+                # held in memory
+                response = StreamingHttpResponse(exporter.stream(cursor=cursor), content_type='application/octet-stream')
+                response['Content-Disposition'] = f'attachment; filename="mypass-{user.username}.{form.cleaned_data["format"]}.enc"'
+                return response
+    else:
+        form = VaultExportForm()
+
+    return render(request, 'vault_export.html', {'form': form})
+
+
+# Where each kind of search result links to, saved passwords have no detail page
+SEARCH_RESULT_URLS = {'login': 'login_detail', 'secure_note': 'securenote_detail', 'identity': 'identity_detail'}
+
+
+@session_login_required
+def vault_search(request):
+    session_manager = SessionManager.for_request(request)
+    if session_manager.has_timed_out():
+        session_manager.logout()
+        messages.warning(request, "Your account has been locked due to inactivity.")
+        return redirect('login')
+    session_manager.update_last_activity()
+    user = session_manager.get_current_user()
 
+    query = request.GET.get('q', '').strip()
+    started = time.monotonic()
+    results = search_vault(user.id, query) if query else []
+    took_ms = round((time.monotonic() - started) * 1000, 2)
+    for result in results:
+        name = SEARCH_RESULT_URLS.get(result['kind'])
+        result['url'] = reverse(name, args=[result['id']]) if name else reverse('saved_passwords')
 
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'query': query, 'results': results, 'took_ms': took_ms})
+    return render(request, 'vault_search.html', {'query': query, 'results': results, 'took_ms': took_ms})
 
 
 def register(request):
@@ -262,8 +445,7 @@ def register(request):
 
 @session_login_required
 def change_password(request):
-    session_manager = SessionManager()
-    session_manager.set_request(request)
+    session_manager = SessionManager.for_request(request)
 
     if session_manager.has_timed_out():
         session_manager.logout() 
@@ -288,8 +470,7 @@ def change_password(request):
 
 
 def logout_view(request):
-    session_manager = SessionManager()
-    session_manager.set_request(request)
+    session_manager = SessionManager.for_request(request)
     session_manager.logout()
     messages.get_messages(request).used = True
     messages.success(request, "You have been successfully logged out.")
@@ -385,8 +566,7 @@ def password_reset(request):
 
 @session_login_required
 def delete_password(request, pk):
-    session_manager = SessionManager()
-    session_manager.set_request(request)
+    session_manager = SessionManager.for_request(request)
 
     # Ensure that only the current user can delete their passwords
     user = session_manager.get_current_user()
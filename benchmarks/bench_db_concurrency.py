@@ -0,0 +1,136 @@
+"""
+Benchmark for concurrent vault reads and writes on SQLite, comparing the
+default settings (rollback journal, a new connection per request) with
+settings_production (WAL, synchronous=NORMAL, mmap, busy timeout, persistent
+connections).
+
+Every profile runs in its own process against a fresh database file. Reader
+threads list a page of saved logins, writer threads save secure notes, and each
+operation ends like a request does (close_old_connections), so CONN_MAX_AGE
+decides whether the next one reconnects. DEBUG is off in both profiles.
+
+Run from the project root:
+python benchmarks/bench_db_concurrency.py [seconds] [readers] [writers]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PROFILES = {
+    'default': 'MyPass.settings',
+    'production': 'MyPass.settings_production',
+}
+
+
+def run_profile(path, seconds, readers, writers, logins=5000):
+    # Runs in the child process, DJANGO_SETTINGS_MODULE is set by main()
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = path
+    settings.DEBUG = False
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import OperationalError, close_old_connections, connection, transaction
+    from MyPassApplication.models import Login, SecureNote, User
+
+    call_command('migrate', verbosity=0)
+    user = User.objects.create(username='bench', password='bench', email='bench@example.com')
+    Login.objects.bulk_create(
+        [Login(user=user, site_name=f"site{i}", site_url=f"https://site{i}.example",
+               username=f"user{i}", password=f"password{i}") for i in range(logins)],
+        batch_size=500,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode")
+        journal_mode = cursor.fetchone()[0]
+    connection.close()
+
+    deadline = time.monotonic() + seconds
+    lock = threading.Lock()
+    results = {'reads': 0, 'writes': 0, 'errors': 0, 'read_latency': [], 'write_latency': []}
+
+    def worker(operation, kind):
+        count = errors = 0
+        latency = []
+        n = 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                operation(n)
+                count += 1
+                latency.append(time.perf_counter() - started)
+            except OperationalError:  # database is locked
+                errors += 1
+            close_old_connections()
+            n += 1
+        connection.close()
+        with lock:
+            results[kind] += count
+            results['errors'] += errors
+            results[f'{kind[:-1]}_latency'] += latency
+
+    def read(n):
+        offset = (n * 25) % logins
+        list(Login.objects.filter(user_id=user.id).order_by('id')
+             .values_list('id', 'site_name', 'username')[offset:offset + 25])
+        Login.objects.filter(user_id=user.id).count()
+
+    def write(n):
+        with transaction.atomic():
+            SecureNote.objects.create(user_id=user.id, title=f"note {n}", content="benchmark note")
+
+    threads = [threading.Thread(target=worker, args=(read, 'reads')) for _ in range(readers)]
+    threads += [threading.Thread(target=worker, args=(write, 'writes')) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    def p95(values):
+        return sorted(values)[int(len(values) * 0.95)] * 1000 if values else 0.0
+
+    return {
+        'journal_mode': journal_mode,
+        'reads_per_second': results['reads'] / seconds,
+        'writes_per_second': results['writes'] / seconds,
+        'read_p95_ms': p95(results['read_latency']),
+        'write_p95_ms': p95(results['write_latency']),
+        'errors': results['errors'],
+    }
+
+
+def main(seconds=5, readers=4, writers=2):
+    measured = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for profile, module in PROFILES.items():
+            env = dict(os.environ, DJANGO_SETTINGS_MODULE=module)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child',
+                 os.path.join(directory, f'{profile}.sqlite3'), str(seconds), str(readers), str(writers)],
+                env=env, cwd=ROOT, check=True, capture_output=True, text=True,
+            ).stdout
+            measured[profile] = result = json.loads(output.strip().splitlines()[-1])
+            print(f"{profile:>10} ({result['journal_mode']}): {result['reads_per_second']:,.0f} reads/s "
+                  f"(p95 {result['read_p95_ms']:.1f} ms), {result['writes_per_second']:,.0f} writes/s "
+                  f"(p95 {result['write_p95_ms']:.1f} ms), {result['errors']} lock errors")
+    default, production = measured['default'], measured['production']
+    print(f"{readers} readers, {writers} writers for {seconds}s: production profile does "
+          f"{production['reads_per_second'] / max(default['reads_per_second'], 1):.1f}x the reads and "
+          f"{production['writes_per_second'] / max(default['writes_per_second'], 1):.1f}x the writes")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        path, seconds, readers, writers = sys.argv[2], *map(int, sys.argv[3:6])
+        print(json.dumps(run_profile(path, seconds, readers, writers)))
+    else:
+        main(*map(int, sys.argv[1:4]))
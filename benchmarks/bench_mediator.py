@@ -0,0 +1,40 @@
+"""
+Micro-benchmark for UIMediator.notify: events dispatched per second through the
+components registered by the app.
+
+Run from the project root:
+python benchmarks/bench_mediator.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MyPass.settings')
+
+import django
+
+django.setup()
+
+from MyPassApplication.components import Dashboard, SavedPasswords
+from MyPassApplication.mediators import UIMediator
+
+EVENTS = ["password_created", "password_deleted", "password_updated", "identity_created",
+          "credit_card_updated", "secure_note_deleted", "identity_expired", "unknown_event"]
+
+
+def main(iterations=200_000):
+    mediator = UIMediator()
+    mediator.register("SavedPasswords", SavedPasswords(mediator))
+    mediator.register("Dashboard", Dashboard(mediator))
+    data = {"id": 1, "name": "example"}
+
+    started = time.perf_counter()
+    for i in range(iterations):
+        mediator.notify("benchmark", EVENTS[i % len(EVENTS)], data)
+    elapsed = time.perf_counter() - started
+    print(f"{iterations} events in {elapsed:.3f}s: {iterations / elapsed:,.0f} events/sec")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Benchmark for PasswordBuilder.build_many against the previous one-at-a-time
+generator (random.choice per character).
+
+Run from the project root:
+python benchmarks/bench_password_builder.py [count]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MyPass.settings')
+
+import django
+
+django.setup()
+
+from MyPassApplication.password_builder import ComplexPasswordBuilder
+
+
+def previous_generator(builder, count):
+    builder.build_character_pool()
+    pool, length = builder.character_pool, builder.get_length()
+    return [''.join(random.choice(pool) for _ in range(length)) for _ in range(count)]
+
+
+def timed(label, function, count):
+    started = time.perf_counter()
+    passwords = function()
+    elapsed = time.perf_counter() - started
+    assert len(passwords) == count
+    print(f"{label:<28} {count} passwords in {elapsed:.3f}s ({count / elapsed:,.0f} passwords/sec)")
+
+
+def main(count=100_000):
+    builder = ComplexPasswordBuilder()
+    timed("random.choice (previous)", lambda: previous_generator(builder, count), count)
+    timed("build_many", lambda: builder.build_many(count, require_all_classes=False), count)
+    timed("build_many (all classes)", lambda: builder.build_many(count), count)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,43 @@
+"""
+Benchmark for the vault health scoring (vault_audit.score_passwords) on a
+synthetic vault, no database involved.
+
+Run from the project root:
+python benchmarks/bench_vault_audit.py [entries]
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MyPass.settings')
+
+import django
+
+django.setup()
+
+from MyPassApplication.vault_audit import score_passwords
+
+
+def main(entries=50_000):
+    rng = random.Random(476)
+    alphabet = string.ascii_letters + string.digits + string.punctuation
+    names = [f"site{i % 5000}" for i in range(entries)]
+    usernames = [f"user{i % 700}" for i in range(entries)]
+    passwords = [''.join(rng.choice(alphabet) for _ in range(rng.randint(6, 24))) for _ in range(entries)]
+    for i in range(0, entries, 10):
+        passwords[i] = passwords[i // 2]  # some reuse
+    for i in range(0, entries, 25):
+        passwords[i] = names[i] + "2024"  # some name-like passwords
+
+    started = time.perf_counter()
+    scores = score_passwords(passwords, names, usernames)
+    elapsed = time.perf_counter() - started
+    print(f"scored {entries} passwords in {elapsed:.3f}s ({entries / elapsed:,.0f} passwords/sec), "
+          f"{int((scores['reuse_count'] > 1).sum())} reused, {int(scores['similar'].sum())} similar to names")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)